@@ -20,6 +20,14 @@ fileConfig(config.config_file_name)
 from src import database, models, settings
 target_metadata = models.Base.metadata
 
+
+def include_name(name, type_, parent_names):
+    # the full-text index tables aren't part of the metadata, see models.CUSTOMERS_FTS_DDL
+    if type_ == "table":
+        return not name.startswith("customers_fts")
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -69,6 +77,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_name=include_name,
             render_as_batch=config.get_main_option('sqlalchemy.url').startswith('sqlite:///')
         )
 
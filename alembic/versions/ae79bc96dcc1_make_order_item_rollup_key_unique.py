@@ -0,0 +1,38 @@
+"""Make order item rollup key unique
+
+Revision ID: ae79bc96dcc1
+Revises: e5a3c9f20d17
+Create Date: 2026-10-18 18:02:44.315907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ae79bc96dcc1'
+down_revision = 'e5a3c9f20d17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the conflict target of the rollup upserts, see crud._upsert_rollups. NULLs are distinct in a
+    # unique index: rollups without a campaign are keyed as campaign 0
+    op.drop_index('ix_order_item_rollups_key', table_name='order_item_rollups')
+    op.create_index(
+        'ix_order_item_rollups_key',
+        'order_item_rollups',
+        ['date', 'menu_item_id', sa.text('coalesce(campaign_id, 0)')],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_order_item_rollups_key', table_name='order_item_rollups')
+    op.create_index(
+        'ix_order_item_rollups_key',
+        'order_item_rollups',
+        ['date', 'menu_item_id', 'campaign_id'],
+        unique=False,
+    )
@@ -0,0 +1,56 @@
+"""Add customer full text search
+
+Revision ID: e5a3c9f20d17
+Revises: 2b8e5d71c4fa
+Create Date: 2026-10-18 16:21:09.741250
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a3c9f20d17'
+down_revision = '2b8e5d71c4fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # see models.CUSTOMERS_FTS_DDL
+    op.execute("""
+        CREATE VIRTUAL TABLE customers_fts USING fts5(
+            name, email, phone, notes,
+            content='customers', content_rowid='id', prefix='2 3'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER customers_fts_insert AFTER INSERT ON customers BEGIN
+            INSERT INTO customers_fts(rowid, name, email, phone, notes)
+            VALUES (new.id, new.name, new.email, new.phone, new.notes);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER customers_fts_delete AFTER DELETE ON customers BEGIN
+            INSERT INTO customers_fts(customers_fts, rowid, name, email, phone, notes)
+            VALUES ('delete', old.id, old.name, old.email, old.phone, old.notes);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER customers_fts_update AFTER UPDATE OF name, email, phone, notes ON customers
+        BEGIN
+            INSERT INTO customers_fts(customers_fts, rowid, name, email, phone, notes)
+            VALUES ('delete', old.id, old.name, old.email, old.phone, old.notes);
+            INSERT INTO customers_fts(rowid, name, email, phone, notes)
+            VALUES (new.id, new.name, new.email, new.phone, new.notes);
+        END
+    """)
+    # index the existing customers
+    op.execute("INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER customers_fts_update")
+    op.execute("DROP TRIGGER customers_fts_delete")
+    op.execute("DROP TRIGGER customers_fts_insert")
+    op.execute("DROP TABLE customers_fts")
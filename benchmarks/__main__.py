@@ -0,0 +1,218 @@
+"""
+Benchmarks of the API's main endpoints, against a seeded SQLite database:
+
+    python -m benchmarks run            # both targets, saved to benchmarks/results/<timestamp>.json
+    python -m benchmarks run --target uvicorn --concurrency 16 --requests 2000
+    python -m benchmarks compare before.json after.json
+    python -m benchmarks serialization  # per order cost of validated vs trusted serialization
+
+The TestClient target measures the app alone, one request at a time. The uvicorn target runs the
+app in a server process and sends requests over HTTP from concurrent clients.
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import click
+
+RESULTS_DIR = Path(__file__).parent / "results"
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def _configure(database: Path):
+    """The app's settings are read on import, set them before importing it"""
+    os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ.pop("SQLALCHEMY_ASYNC_DATABASE_URL", None)
+    os.environ.pop("SQLALCHEMY_READ_DATABASE_URL", None)
+    os.environ.setdefault("COOKIE_SECRET", "benchmark-secret")
+    os.environ.setdefault("COOKIE_MAX_AGE_MINUTES", "60")
+    os.environ.setdefault("SLOW_QUERY_THRESHOLD_MS", "-1")
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option("--target", type=click.Choice(["testclient", "uvicorn", "all"]), default="all")
+@click.option(
+    "--scale",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Dataset size: 1000 customers and 10000 orders per unit, see src/seed.py",
+)
+@click.option(
+    "--requests",
+    "request_count",
+    type=int,
+    default=500,
+    show_default=True,
+    help="Requests per scenario, times the scenario's weight",
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    default=8,
+    show_default=True,
+    help="Concurrent clients of the uvicorn target",
+)
+@click.option("--workers", type=int, default=1, show_default=True, help="uvicorn worker processes")
+@click.option("--scenario", "scenario_names", multiple=True, help="Only run these scenarios")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Defaults to benchmarks/results/<timestamp>.json",
+)
+def run(target, scale, request_count, concurrency, workers, scenario_names, seed, output):
+    """Seed a database, then benchmark every scenario"""
+    with tempfile.TemporaryDirectory() as directory:
+        _configure(Path(directory) / "bakery.db")
+        import httpx
+        from fastapi.testclient import TestClient
+
+        from benchmarks import runner
+        from benchmarks.dataset import seed as seed_dataset
+        from benchmarks.scenarios import SCENARIOS
+        from src import database, logs, models
+        from src.main import app
+
+        scenarios = {
+            name: scenario
+            for name, scenario in SCENARIOS.items()
+            if not scenario_names or name in scenario_names
+        }
+        models.Base.metadata.create_all(database.engine)
+        click.echo(f"Seeding a dataset at scale {scale}")
+        with database.SessionLocal() as db:
+            dataset = seed_dataset(db, scale, random.Random(seed))
+
+        results = {}
+        # the app's logs would drown the progress, but keep paying for them
+        logs.setup(stream=open(os.devnull, "w"))
+        if target in ("testclient", "all"):
+            results["testclient"] = {}
+            with TestClient(app) as client:
+                runner.login(client)
+                for name, scenario in scenarios.items():
+                    count = max(1, int(request_count * scenario.weight))
+                    click.echo(f"testclient: {name} x{count}")
+                    results["testclient"][name] = runner.run_sequential(
+                        client, scenario, dataset, count, random.Random(seed)
+                    )
+        if target in ("uvicorn", "all"):
+            results["uvicorn"] = {}
+            with runner.uvicorn_server(workers) as base_url:
+
+                def make_client():
+                    return runner.login(httpx.Client(base_url=base_url))
+
+                for name, scenario in scenarios.items():
+                    count = max(concurrency, int(request_count * scenario.weight))
+                    click.echo(f"uvicorn: {name} x{count}, {concurrency} concurrent clients")
+                    results["uvicorn"][name] = runner.run_concurrent(
+                        make_client, scenario, dataset, count, concurrency, seed
+                    )
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scale": scale,
+            "orders": dataset.orders,
+            "customers": len(dataset.customer_ids),
+            "concurrency": concurrency,
+            "workers": workers,
+        },
+        "results": results,
+    }
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.write_text(json.dumps(report, indent=2))
+    _print_table(results)
+    click.echo(f"Results saved to {output}")
+
+
+def _print_table(results):
+    click.echo(
+        f"{'target':<11} {'scenario':<17} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} "
+        f"{'rps':>9} {'errors':>6}"
+    )
+    for target, scenarios in results.items():
+        for name, result in scenarios.items():
+            click.echo(
+                f"{target:<11} {name:<17} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+                f"{result['p99_ms']:>9} {result['throughput_rps']:>9} "
+                f"{result['errors']:>6}"
+            )
+
+
+@cli.command()
+@click.option("--scale", type=float, default=0.1, show_default=True, help="Dataset size")
+@click.option("--size", type=int, default=500, show_default=True, help="Orders per page")
+@click.option("--repeat", type=int, default=5, show_default=True, help="Best of this many runs")
+@click.option("--seed", type=int, default=0, show_default=True)
+def serialization(scale, size, repeat, seed):
+    """Render a page of orders through the response_model and through trusted_response"""
+    with tempfile.TemporaryDirectory() as directory:
+        _configure(Path(directory) / "bakery.db")
+        from benchmarks import serialization as serialization_benchmark
+        from benchmarks.dataset import seed as seed_dataset
+        from src import database, models
+
+        models.Base.metadata.create_all(database.engine)
+        click.echo(f"Seeding a dataset at scale {scale}")
+        with database.SessionLocal() as db:
+            seed_dataset(db, scale, random.Random(seed))
+            result = serialization_benchmark.run(db, size, repeat)
+    click.echo(
+        f"{result['orders']} orders, per order: validated {result['validated_us']}us, "
+        f"trusted {result['trusted_us']}us ({result['speedup']}x)"
+    )
+
+
+@cli.command()
+@click.argument("before", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("after", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def compare(before, after):
+    """Relative change of each scenario's latencies and throughput between two runs"""
+    old, new = json.loads(before.read_text()), json.loads(after.read_text())
+    click.echo(f"{old['meta']['revision']} -> {new['meta']['revision']}")
+    click.echo(f"{'target':<11} {'scenario':<17}" + "".join(f"{m:>16}" for m in METRICS))
+    for target, scenarios in new["results"].items():
+        for name, result in scenarios.items():
+            previous = old["results"].get(target, {}).get(name)
+            if previous is None:
+                continue
+            changes = []
+            for metric in METRICS:
+                if previous[metric]:
+                    change = (result[metric] - previous[metric]) / previous[metric] * 100
+                    changes.append(f"{result[metric]:>9} {change:+5.0f}%")
+                else:
+                    changes.append(f"{result[metric]:>9}       ")
+            click.echo(f"{target:<11} {name:<17}" + "".join(f"{c:>16}" for c in changes))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,80 @@
+"""A realistic dataset to benchmark against: a year of a bakery's orders and payments"""
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src import auth, models, schemas
+from src import seed as seeder
+
+USERNAME, PASSWORD = "benchmark", "benchmark-password"
+
+
+@dataclass
+class Dataset:
+    start: date
+    end: date
+    customer_ids: list[int] = field(default_factory=list)
+    campaigns: list[tuple[int, date, date]] = field(default_factory=list)  # (id, start, end)
+    menu_items: list[tuple[int, float]] = field(default_factory=list)  # (id, price)
+    orders: int = 0
+
+
+def seed(db: Session, scale: float, rng: random.Random) -> Dataset:
+    """A year of orders, see src.seed for what a unit of scale is"""
+    end = date.today()
+    dataset = Dataset(start=end - timedelta(days=365), end=end)
+    counts = seeder.seed(db, scale, days=365, rng=rng, end=end)
+    db.add(models.User(name=USERNAME, hashed_password=auth.pwd_context.hash(PASSWORD)))
+    db.commit()
+
+    dataset.customer_ids = list(db.scalars(select(models.Customer.id)))
+    dataset.campaigns = [
+        tuple(row)
+        for row in db.execute(
+            select(models.Campaign.id, models.Campaign.date_start, models.Campaign.date_end)
+        )
+    ]
+    dataset.menu_items = [
+        tuple(row) for row in db.execute(select(models.MenuItem.id, models.MenuItem.price))
+    ]
+    dataset.orders = counts[models.Order.__tablename__]
+    return dataset
+
+
+def random_order(dataset: Dataset, rng: random.Random) -> schemas.OrderCreate:
+    date_ordered = dataset.start + timedelta(days=rng.randrange((dataset.end - dataset.start).days))
+    items = []
+    for menu_item_id, price in rng.sample(dataset.menu_items, rng.randint(1, 4)):
+        items.append(
+            schemas.OrderItemCreateNewOrder(
+                menu_item_id=menu_item_id,
+                quantity=rng.randint(1, 6),
+                menu_price=price,
+                charged_price=price,
+            )
+        )
+    total = sum(item.quantity * item.charged_price for item in items)
+    # most orders are paid and completed within a couple of weeks
+    recent = (dataset.end - date_ordered).days < 14
+    payments = []
+    if not recent or rng.random() < 0.5:
+        payments.append(
+            schemas.PaymentCreateNewOrder(
+                amount=round(total, 2),
+                method=rng.choice(["cash", "zelle", "paypal"]),
+                date=date_ordered + timedelta(days=rng.randint(0, 7)),
+            )
+        )
+    campaign_ids = [id for id, start, end in dataset.campaigns if start <= date_ordered <= end]
+    return schemas.OrderCreate(
+        customer_id=rng.choice(dataset.customer_ids),
+        campaign_id=campaign_ids[0] if campaign_ids else None,
+        date_ordered=date_ordered,
+        date_delivered=None if recent else date_ordered + timedelta(days=rng.randint(1, 10)),
+        completed=not recent,
+        order_items=items,
+        payments=payments,
+    )
@@ -0,0 +1,121 @@
+import contextlib
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import httpx
+
+from benchmarks.dataset import PASSWORD, USERNAME, Dataset
+from benchmarks.scenarios import Scenario
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict[str, Any]:
+    """Latencies in milliseconds, throughput in requests per second"""
+    ms = sorted(latency * 1000 for latency in latencies)
+    percentiles = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "max_ms": round(ms[-1], 3),
+        "throughput_rps": round(len(ms) / elapsed, 1),
+    }
+
+
+def _send(client, scenario: Scenario, dataset: Dataset, rng: random.Random) -> tuple[float, bool]:
+    start = time.perf_counter()
+    response = scenario.request(client, dataset, rng)
+    return time.perf_counter() - start, response.status_code < 400
+
+
+def run_sequential(
+    client, scenario: Scenario, dataset: Dataset, count: int, rng: random.Random
+) -> dict[str, Any]:
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(count):
+        latency, ok = _send(client, scenario, dataset, rng)
+        latencies.append(latency)
+        errors += not ok
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def run_concurrent(
+    make_client: Callable[[], Any],
+    scenario: Scenario,
+    dataset: Dataset,
+    count: int,
+    concurrency: int,
+    seed: int,
+) -> dict[str, Any]:
+    """`count` requests sent by `concurrency` threads, each with a client of its own"""
+    clients = [make_client() for _ in range(concurrency)]
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(index: int) -> tuple[list[float], int]:
+        rng = random.Random(seed + index)
+        latencies, errors = [], 0
+        barrier.wait()
+        for _ in range(count // concurrency + (index < count % concurrency)):
+            latency, ok = _send(clients[index], scenario, dataset, rng)
+            latencies.append(latency)
+            errors += not ok
+        return latencies, errors
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        futures = [executor.submit(worker, i) for i in range(concurrency)]
+        barrier.wait()
+        start = time.perf_counter()
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+    for client in clients:
+        client.close()
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    return summarize(latencies, sum(errors for _, errors in results), elapsed)
+
+
+def login(client):
+    response = client.post("/api/auth/login", json={"username": USERNAME, "password": PASSWORD})
+    response.raise_for_status()
+    return client
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def uvicorn_server(workers: int) -> Iterator[str]:
+    """A uvicorn process serving the app, with the current environment. Yields its base url."""
+    port = _free_port()
+    command = [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port)]
+    command += ["--workers", str(workers), "--no-access-log", "--log-level", "warning"]
+    process = subprocess.Popen(command, env=os.environ.copy(), stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {process.returncode}")
+            with contextlib.suppress(httpx.HTTPError):
+                httpx.get(f"{base_url}/metrics", timeout=1)
+                break
+            time.sleep(0.1)
+        else:
+            raise RuntimeError("uvicorn didn't start")
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
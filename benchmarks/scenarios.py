@@ -0,0 +1,57 @@
+"""
+The requests benchmarked. Each scenario sends one request with an httpx-compatible client (a
+TestClient or an httpx.Client), logged in unless the scenario logs in itself.
+"""
+import json
+import random
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+
+from benchmarks.dataset import PASSWORD, USERNAME, Dataset, random_order
+
+
+@dataclass(frozen=True)
+class Scenario:
+    request: Callable[[Any, Dataset, random.Random], Any]
+    weight: float = 1.0  # share of the run's request count
+
+
+def login(client, dataset: Dataset, rng: random.Random):
+    return client.post("/api/auth/login", json={"username": USERNAME, "password": PASSWORD})
+
+
+def create_order(client, dataset: Dataset, rng: random.Random):
+    order = random_order(dataset, rng)
+    return client.post("/api/v1/orders", json=json.loads(order.json()))
+
+
+def open_orders(client, dataset: Dataset, rng: random.Random):
+    return client.get("/api/v1/orders", params={"completed": False, "size": 50})
+
+
+def payments_by_date(client, dataset: Dataset, rng: random.Random):
+    start = dataset.start + timedelta(days=rng.randrange(335))
+    params = {"inclusive_start_date": start, "exclusive_end_date": start + timedelta(days=30)}
+    return client.get("/api/v1/payments", params={**params, "size": 50})
+
+
+def menu(client, dataset: Dataset, rng: random.Random):
+    return client.get("/api/v1/menu", params={"size": 50})
+
+
+def menu_item(client, dataset: Dataset, rng: random.Random):
+    menu_item_id, _ = rng.choice(dataset.menu_items)
+    return client.get(f"/api/v1/menu/{menu_item_id}")
+
+
+SCENARIOS = {
+    # password hashing dominates, and is meant to be slow
+    "login": Scenario(login, weight=0.1),
+    "create_order": Scenario(create_order),
+    "open_orders": Scenario(open_orders),
+    "payments_by_date": Scenario(payments_by_date),
+    "menu": Scenario(menu),
+    "menu_item": Scenario(menu_item),
+}
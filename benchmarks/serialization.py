@@ -0,0 +1,46 @@
+"""
+Per item cost of rendering a page of orders: FastAPI's `response_model` path (orm_mode validation,
+`jsonable_encoder`, `json.dumps`) against `serialization.trusted_response`.
+"""
+import time
+from collections.abc import Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from src import crud, schemas, serialization
+from src.pagination import KeysetPage
+
+
+def _best_of(repeat: int, render: Callable[[], bytes]) -> tuple[float, bytes]:
+    timings, body = [], b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = render()
+        timings.append(time.perf_counter() - start)
+    return min(timings), body
+
+
+def run(db: Session, size: int, repeat: int) -> dict[str, float]:
+    """Microseconds per order of each path, for a page of `size` completed orders"""
+    orders = db.scalars(crud.read_orders(completed=True).limit(size)).all()
+    page = KeysetPage[schemas.Order].create(orders, params=None)
+
+    def validated() -> bytes:
+        validated_page = KeysetPage[schemas.Order](items=page.items, next_page=None)
+        return JSONResponse(jsonable_encoder(validated_page)).body
+
+    def trusted() -> bytes:
+        return serialization.trusted_response(KeysetPage[schemas.Order], page).body
+
+    before, validated_body = _best_of(repeat, validated)
+    after, trusted_body = _best_of(repeat, trusted)
+    if trusted_body != validated_body:
+        raise AssertionError("trusted_response renders a different body than the response_model")
+    return {
+        "orders": len(orders),
+        "validated_us": round(before / len(orders) * 1e6, 1),
+        "trusted_us": round(after / len(orders) * 1e6, 1),
+        "speedup": round(before / after, 1),
+    }
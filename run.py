@@ -41,6 +41,80 @@ def launch(env_file):
     uvicorn.run('src.main:app', host='localhost', port=PORT, reload=ENV == 'dev')
 
 
+@app.command()
+@click.option('-e', '--env-file', 'env_file', type=click.Path(exists=True), default=None)
+@click.option('--host', default='0.0.0.0', show_default=True)
+@click.option('--port', type=int, default=None, help='Defaults to settings.PORT')
+@click.option('-w', '--workers', type=int, default=os.cpu_count() or 1, show_default=True)
+@click.option('--loop', type=click.Choice(['uvloop', 'asyncio', 'auto']), default='uvloop', show_default=True)
+@click.option('--http', type=click.Choice(['httptools', 'h11', 'auto']), default='httptools', show_default=True)
+@click.option('--backlog', type=int, default=2048, show_default=True,
+              help='Connections queued by the listening socket')
+@click.option('--keep-alive', type=int, default=5, show_default=True,
+              help='Seconds an idle keep-alive connection is kept open')
+@click.option('--limit-concurrency', type=int, default=None,
+              help='Connections and tasks per worker before answering 503s')
+@click.option('--max-requests', type=int, default=10000, show_default=True,
+              help='Requests before a worker is gracefully restarted, 0 never restarts it')
+@click.option('--max-requests-jitter', type=int, default=1000, show_default=True,
+              help='Random extra requests per worker, so that workers do not restart together')
+@click.option('--timeout', type=int, default=30, show_default=True,
+              help='Seconds before a silent worker is killed and restarted')
+@click.option('--graceful-timeout', type=int, default=30, show_default=True,
+              help='Seconds a restarting worker has to finish its requests')
+@click.option('--preload/--no-preload', default=True, show_default=True,
+              help='Import the app once before forking the workers')
+def serve(env_file, host, port, workers, loop, http, backlog, keep_alive, limit_concurrency,
+          max_requests, max_requests_jitter, timeout, graceful_timeout, preload):
+    """Production server: gunicorn managing uvicorn workers"""
+    if env_file:
+        load_env(env_file)
+    correct_cwd()
+    if workers > 1 and not preload:
+        # the cache generations are only shared by workers forked from a preloaded app
+        click.echo('Not preloading: disabling the response and session caches and the typeahead '
+                   'index, see src/cache.py')
+        os.environ['RESPONSE_CACHE_SIZE'] = '0'
+        os.environ['SESSION_CACHE_SIZE'] = '0'
+        os.environ['TYPEAHEAD_INDEX'] = 'false'
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+    from src.settings import PORT
+
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {'loop': loop, 'http': http, 'limit_concurrency': limit_concurrency}
+
+    def post_fork(server, worker):
+        # connections opened by the master must not be shared with the workers
+        from src import database
+        database.engine.dispose(close=False)
+        database.read_engine.dispose(close=False)
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f'{host}:{port or PORT}',
+                'workers': workers,
+                'worker_class': Worker,
+                'backlog': backlog,
+                'keepalive': keep_alive,
+                'max_requests': max_requests,
+                'max_requests_jitter': max_requests_jitter,
+                'timeout': timeout,
+                'graceful_timeout': graceful_timeout,
+                'preload_app': preload,
+                'post_fork': post_fork,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from src.main import app
+            return app
+
+    Application().run()
+
+
 @cli.group()
 def db():
     pass
@@ -75,5 +149,58 @@ def create_migration(env_file):
     alembic.command.revision(cfg, message, autogenerate=True)
 
 
+@db.command()
+@click.option('-e', '--env-file', 'env_file', type=click.Path(exists=True), default=None)
+def rebuild_rollups(env_file):
+    """
+    Recompute the report rollup tables from the payments and order items.
+
+    A running app's response cache doesn't see writes made by other processes, restart it after.
+    """
+    if env_file:
+        load_env(env_file)
+    correct_cwd()
+    from src import crud, database
+    click.echo('Rebuilding report rollups')
+    with database.SessionLocal() as session:
+        crud.rebuild_rollups(session)
+    click.echo('done')
+
+
+@db.command()
+@click.option('-e', '--env-file', 'env_file', type=click.Path(exists=True), default=None)
+@click.option('--scale', type=float, default=1.0, show_default=True,
+              help='1000 customers and 10000 orders, about 38000 rows, per unit')
+@click.option('--days', type=int, default=365, show_default=True,
+              help='Orders are spread over this many days until today')
+@click.option('--seed', 'random_seed', type=int, default=None, help='Random seed, for a reproducible dataset')
+def seed(env_file, scale, days, random_seed):
+    """
+    Fill an empty, migrated database with synthetic customers, menu, campaigns and orders.
+
+    A running app's response cache doesn't see writes made by other processes, restart it after.
+    """
+    if env_file:
+        load_env(env_file)
+    correct_cwd()
+    import random
+    import time
+    from src import database, seed as seeder
+    from src.settings import SQLALCHEMY_DATABASE_URL
+    click.echo(f'Confirm seeding of {SQLALCHEMY_DATABASE_URL} at scale {scale}')
+    if click.prompt("'y' to continue\n") != 'y':
+        click.echo('aborted')
+        return
+    start = time.perf_counter()
+    with database.SessionLocal() as session:
+        try:
+            counts = seeder.seed(session, scale, days, random.Random(random_seed))
+        except ValueError as e:
+            raise click.ClickException(f'{e}, seed an empty database')
+    for table, count in counts.items():
+        click.echo(f'{table}: {count} rows')
+    click.echo(f'{sum(counts.values())} rows in {time.perf_counter() - start:.1f}s')
+
+
 if __name__ == '__main__':
     cli()
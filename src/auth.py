@@ -1,22 +1,81 @@
+import asyncio
 import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import jwt
 from fastapi import HTTPException, Request, Response
 from passlib.context import CryptContext
-from starlette.status import HTTP_403_FORBIDDEN
+from starlette.status import HTTP_403_FORBIDDEN, HTTP_503_SERVICE_UNAVAILABLE
 
-from src import settings
+from src import cache, models, settings
 
 logger = logging.getLogger("bakery")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=settings.PASSWORD_SCHEMES,
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    # bcrypt hashes with any other cost need an update
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+_hash_pool: ProcessPoolExecutor | None = None
+_hash_pool_lock = threading.Lock()
+_hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def _verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        return _hash_pool
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(cancel_futures=True)
+            _hash_pool = None
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """
+    Verify the password in the password hashing process pool, so a burst of logins can't starve
+    the request workers of CPU. Returns whether the password matched and, if the hash doesn't match
+    the current policy (PASSWORD_SCHEMES, BCRYPT_ROUNDS), a replacement hash to store.
+    """
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            HTTP_503_SERVICE_UNAVAILABLE, "Too many logins, try again", {"Retry-After": "1"}
+        )
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _get_hash_pool(), _verify_and_update_password, plain_password, hashed_password
+        )
+    finally:
+        _hash_slots.release()
+
+
 def set_cookie(response: Response, username: str):
     created_at = datetime.now(timezone.utc)
     expires_at = created_at + timedelta(minutes=settings.COOKIE_MAX_AGE_MINUTES)
@@ -67,3 +126,60 @@ def decode_token(token: str) -> dict:
         "created_at": datetime.fromtimestamp(payload["iat"], timezone.utc),
         "expires_at": datetime.fromtimestamp(payload["exp"], timezone.utc),
     }
+
+
+class SessionCache:
+    """
+    Bounded LRU of verified session token -> user, so that authenticating a request with a token
+    seen before costs neither a jwt decode nor a database query.
+    Entries are stored with the generation of the users table (see cache.py) taken before the user
+    was read: a committed write to the users, by any worker, drops them. Writes the app doesn't
+    see (another process, a worker that doesn't share the generations) are only picked up once
+    the entry expires, after `ttl` seconds at most.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, int, models.User]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def generation() -> int:
+        return cache.generations((models.User.__tablename__,))[0]
+
+    def get(self, token: str) -> models.User | None:
+        generation = self.generation()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, cached_generation, user = entry
+            if expires_at <= time.time() or cached_generation != generation:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user
+
+    def set(self, token: str, user: models.User, expires_at: datetime, generation: int):
+        if self.maxsize <= 0:
+            return
+        # cache a detached copy, the user instance belongs to the request's session
+        snapshot = models.User(id=user.id, name=user.name)
+        expires = min(expires_at.timestamp(), time.time() + self.ttl)
+        with self._lock:
+            self._entries[token] = (expires, generation, snapshot)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+session_cache = SessionCache(settings.SESSION_CACHE_SIZE, settings.SESSION_CACHE_TTL_SECONDS)
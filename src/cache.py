@@ -0,0 +1,195 @@
+"""
+In-process response cache for read-mostly GET routes.
+
+Every table has a generation counter, bumped when a transaction writing to it commits. Cached
+responses are stored with the generations of the tables they were read from, taken before the
+route ran, and are only served while those generations are unchanged: a write invalidates every
+response that depends on it, including ones computed concurrently with the write.
+
+Writes are tracked with Session events (flushed objects and bulk insert/update/delete statements),
+so `crud` functions bump the generations of the tables they write just by committing.
+Generations live in shared memory allocated at import: workers forked from a preloaded app (see
+`./run.py app serve`) see each other's writes, other processes don't. Writes made outside of the
+app (e.g. `./run.py db rebuild-rollups` or `db seed`) are only seen after restarting it. Workers
+started some other way (e.g. `uvicorn --workers`) need RESPONSE_CACHE_SIZE=0,
+SESSION_CACHE_SIZE=0 and TYPEAHEAD_INDEX=false, as `./run.py app serve --no-preload` sets.
+
+With a replica, a response read just after a write may predate it (see get_read_db): responses
+to tables written less than READ_YOUR_WRITES_SECONDS ago aren't stored.
+
+Usage: `APIRouter(..., route_class=cache.cached_route(models.MenuItem, models.MenuCategory))`.
+Cached responses are shared by all users, only cache routes whose response doesn't depend on who
+is asking.
+"""
+import ctypes
+import itertools
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from fastapi import Depends, Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from src import database, etag, models, settings
+
+# Generations
+
+
+_slots = {table: slot for slot, table in enumerate(models.Base.metadata.tables)}
+_generations = multiprocessing.RawArray(ctypes.c_uint64, len(_slots))
+_bumped_at = multiprocessing.RawArray(ctypes.c_double, len(_slots))  # time.time()
+_generations_lock = multiprocessing.Lock()
+
+
+def generations(tables: tuple[str, ...]) -> tuple[int, ...]:
+    return tuple(_generations[_slots[table]] for table in tables)
+
+
+def bump(*tables: str):
+    now = time.time()
+    with _generations_lock:
+        for table in tables:
+            if table in _slots:  # tables outside of the models, e.g. customers_fts, aren't cached
+                _generations[_slots[table]] += 1
+                _bumped_at[_slots[table]] = now
+
+
+def bumped_since(tables: tuple[str, ...], timestamp: float) -> bool:
+    return any(_bumped_at[_slots[table]] > timestamp for table in tables)
+
+
+_WRITTEN_TABLES = "cache_written_tables"
+
+
+def _written_tables(session: Session) -> set[str]:
+    return session.info.setdefault(_WRITTEN_TABLES, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_tables(session: Session, flush_context: Any):
+    tables = _written_tables(session)
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        tables.update(table.name for table in inspect(instance).mapper.tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_statement_tables(orm_execute_state: ORMExecuteState):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _written_tables(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_written_tables(session: Session):
+    bump(*session.info.pop(_WRITTEN_TABLES, ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_tables(session: Session):
+    session.info.pop(_WRITTEN_TABLES, None)
+
+
+# Responses
+
+
+class ResponseCache:
+    """LRU of rendered responses, each stored with the table generations it was computed at"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[tuple[int, ...], Response]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, generations: tuple[int, ...]) -> Response | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != generations:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            response = entry[1]
+        return Response(response.body, response.status_code, dict(response.headers))
+
+    def set(self, key: str, generations: tuple[int, ...], response: Response):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generations, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE)
+
+
+class CacheHit(Exception):
+    """Raised by the lookup dependency to skip the route, see main.handle_cache_hit"""
+
+    def __init__(self, response: Response):
+        self.response = response
+
+
+def _cache_key(request: Request) -> str:
+    return f"{request.url.path}?{request.url.query}"
+
+
+class CachedRoute(APIRoute):
+    """
+    Caches the successful responses of GET routes. The lookup runs as the route's last dependency,
+    i.e. after the router's dependencies (authentication), and the response is stored once the
+    route has rendered it.
+    """
+
+    tables: tuple[str, ...] = ()
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if "GET" in (kwargs.get("methods") or ()):
+            dependencies = list(kwargs.get("dependencies") or ())
+            if not any(d.dependency == self._lookup for d in dependencies):
+                dependencies.append(Depends(self._lookup))
+            kwargs["dependencies"] = dependencies
+        super().__init__(path, endpoint, **kwargs)
+
+    @classmethod
+    async def _lookup(cls, request: Request):
+        key, current = _cache_key(request), generations(cls.tables)
+        response = response_cache.get(key, current)
+        if response is not None:
+            tag = response.headers.get("etag")
+            if tag is not None and etag.if_none_match(request, tag):
+                response = Response(status_code=304, headers={"ETag": tag})
+            raise CacheHit(response)
+        if database.has_replica and bumped_since(
+            cls.tables, time.time() - settings.READ_YOUR_WRITES_SECONDS
+        ):
+            return  # the replica may not have caught up with the write, don't store its response
+        request.state.response_cache_entry = key, current
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def cached_handler(request: Request) -> Response:
+            response = await handler(request)
+            entry = getattr(request.state, "response_cache_entry", None)
+            if entry is not None and response.status_code == 200 and hasattr(response, "body"):
+                response_cache.set(*entry, response)
+            return response
+
+        return cached_handler
+
+
+def cached_route(*tables: type[models.Base]) -> type[CachedRoute]:
+    """A `CachedRoute` class for routes reading (only) from the tables of the given models"""
+    names = tuple(model.__tablename__ for model in tables)
+    return type("CachedRoute", (CachedRoute,), {"tables": names})
@@ -1,11 +1,28 @@
 import re
+from collections import defaultdict
+from collections.abc import Collection, Sequence
 from datetime import date
 
 from fastapi.exceptions import HTTPException
+from sqlalchemy import (
+    Float,
+    Row,
+    Select,
+    delete,
+    false,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    update,
+)
+from sqlalchemy.dialects.sqlite import Insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Query, Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 
-from src import models, schemas
+from src import models, schemas, typeahead
 
 
 def create_unique_constrain_error_msg(exc: IntegrityError) -> str | None:
@@ -30,6 +47,13 @@ def read_user(db: Session, username: str) -> models.User | None:
     return db.query(models.User).filter(models.User.name == username).first()
 
 
+def update_user_password(db: Session, user: models.User, hashed_password: str) -> models.User:
+    user.hashed_password = hashed_password
+    db.add(user)
+    db.commit()
+    return user
+
+
 # Customer
 
 
@@ -44,33 +68,56 @@ def read_customer(db: Session, customer_id: int) -> models.Customer | None:
     return db.query(models.Customer).filter(models.Customer.id == customer_id).first()
 
 
+def read_customer_version(db: Session, customer_id: int) -> Row | None:
+    """See `etag`"""
+    query = select(models.Customer.id, models.Customer.date_modified)
+    return db.execute(query.where(models.Customer.id == customer_id)).first()
+
+
 def read_customers(
-    db: Session,
     name: str | None,
     email: str | None,
     phone: str | None,
     order_by: str,
     descending: bool,
-) -> Query[models.Customer]:
-    query = db.query(models.Customer)
+) -> Select[tuple[models.Customer]]:
+    query = select(models.Customer)
     if name is not None:
-        query = query.filter(models.Customer.name.startswith(name.lower()))
+        query = query.where(models.Customer.name.startswith(name.lower()))
     if email is not None:
-        query = query.filter(models.Customer.email.startswith(email.lower()))
+        query = query.where(models.Customer.email.startswith(email.lower()))
     if phone is not None:
-        query = query.filter(models.Customer.phone.startswith(phone.lower()))
+        query = query.where(models.Customer.phone.startswith(phone.lower()))
 
     if order_by == "name":
         order_by_field = models.Customer.name
     elif order_by == "email":
-        order_by_field = models.Customer.email
+        order_by_field = func.coalesce(models.Customer.email, "")
     elif order_by == "phone":
-        order_by_field = models.Customer.phone
+        order_by_field = func.coalesce(models.Customer.phone, "")
     else:
         raise ValueError(order_by)
+    # id breaks ties so that the ordering is unique, as keyset pagination requires
     if descending:
-        return query.order_by(order_by_field.desc())
-    return query.order_by(order_by_field)
+        return query.order_by(order_by_field.desc(), models.Customer.id.desc())
+    return query.order_by(order_by_field, models.Customer.id)
+
+
+def search_customers(q: str) -> Select[tuple[models.Customer]]:
+    """
+    Customers matching every word of `q` as a prefix of a word of their name, email, phone or
+    notes, best match first. Ranked with bm25, matches on the name weigh the most.
+    """
+    terms = re.findall(r"\w+", q)
+    fts = models.customers_fts
+    rank = func.bm25(literal_column(fts.name), 10.0, 5.0, 5.0, 1.0, type_=Float)
+    query = select(models.Customer).join(fts, fts.c.rowid == models.Customer.id)
+    if not terms:
+        query = query.where(false())
+    else:
+        # quoted, so that the words are never read as FTS5 query syntax
+        query = query.where(fts.c.customers_fts.op("MATCH")(" ".join(f'"{t}"*' for t in terms)))
+    return query.order_by(rank, models.Customer.id)
 
 
 def update_customer(
@@ -100,8 +147,8 @@ def read_menu_category(db: Session, category_id: int) -> models.MenuCategory | N
     return db.query(models.MenuCategory).filter(models.MenuCategory.id == category_id).first()
 
 
-def read_menu_categories(db: Session):
-    return db.query(models.MenuCategory)
+def read_menu_categories() -> Select[tuple[models.MenuCategory]]:
+    return select(models.MenuCategory).order_by(models.MenuCategory.id)
 
 
 def update_menu_category(
@@ -116,33 +163,54 @@ def update_menu_category(
         setattr(db_category, attr, value)
     db.add(db_category)
     db.commit()
+    typeahead.menu_index.update_category(db_category)
     return db_category
 
 
 # MenuItem
 
+_MENU_ITEM_GRAPH = (joinedload(models.MenuItem.category),)
+
 
 def create_menu_item(db: Session, menu_item: schemas.MenuItemCreate) -> models.MenuItem:
     db_menu_item = models.MenuItem(**menu_item.dict())
     db.add(db_menu_item)
     db.commit()
+    typeahead.menu_index.update_menu_item(db_menu_item)
     return db_menu_item
 
 
 def read_menu_item(db: Session, menu_item_id: int) -> models.MenuItem | None:
-    return db.query(models.MenuItem).filter(models.MenuItem.id == menu_item_id).first()
+    return (
+        db.query(models.MenuItem)
+        .options(*_MENU_ITEM_GRAPH)
+        .filter(models.MenuItem.id == menu_item_id)
+        .first()
+    )
+
+
+def read_menu_item_version(db: Session, menu_item_id: int) -> Row | None:
+    """See `etag`"""
+    query = select(
+        models.MenuItem.id,
+        models.MenuItem.date_modified,
+        models.MenuCategory.id,
+        models.MenuCategory.date_modified,
+    ).join(models.MenuCategory, models.MenuItem.category_id == models.MenuCategory.id)
+    return db.execute(query.where(models.MenuItem.id == menu_item_id)).first()
 
 
 def read_menu_items(
-    db: Session, category_id: int | None, name: str | None, descending: bool
-) -> Query[models.MenuItem]:
-    query = db.query(models.MenuItem)
+    category_id: int | None, name: str | None, descending: bool
+) -> Select[tuple[models.MenuItem]]:
+    query = select(models.MenuItem).options(*_MENU_ITEM_GRAPH)
     if category_id is not None:
-        query = query.filter(models.MenuItem.category_id == category_id)
+        query = query.where(models.MenuItem.category_id == category_id)
     if name is not None:
-        query = query.filter(models.MenuItem.name.startswith(name))
-    order_by = models.MenuItem.name.desc() if descending else models.MenuItem.name
-    return query.order_by(order_by)
+        query = query.where(models.MenuItem.name.startswith(name))
+    if descending:
+        return query.order_by(models.MenuItem.name.desc(), models.MenuItem.id.desc())
+    return query.order_by(models.MenuItem.name, models.MenuItem.id)
 
 
 def update_menu_item(
@@ -155,6 +223,7 @@ def update_menu_item(
         setattr(db_menu_item, attr, value)
     db.add(db_menu_item)
     db.commit()
+    typeahead.menu_index.update_menu_item(db_menu_item)
     return db_menu_item
 
 
@@ -172,8 +241,14 @@ def read_campaign(db: Session, campaign_id: int) -> models.Campaign | None:
     return db.query(models.Campaign).filter(models.Campaign.id == campaign_id).first()
 
 
-def read_campaigns(db: Session) -> Query[models.Campaign]:
-    return db.query(models.Campaign)
+def read_campaign_version(db: Session, campaign_id: int) -> Row | None:
+    """See `etag`"""
+    query = select(models.Campaign.id, models.Campaign.date_modified)
+    return db.execute(query.where(models.Campaign.id == campaign_id)).first()
+
+
+def read_campaigns() -> Select[tuple[models.Campaign]]:
+    return select(models.Campaign).order_by(models.Campaign.id)
 
 
 def update_campaign(
@@ -195,6 +270,8 @@ def update_campaign(
 def create_payment(db: Session, payment: schemas.PaymentCreate) -> models.Order:
     db_payment = models.Payment(**payment.dict())
     db.add(db_payment)
+    _apply_rollups(db, payments=[_payment_rollup(db_payment)])
+    update_order_totals(db, [db_payment.order_id])
     db.commit()
     return db_payment.order
 
@@ -204,16 +281,31 @@ def read_payment(db: Session, payment_id: int) -> models.Payment | None:
 
 
 def read_payments(
-    db: Session,
     inclusive_start_date: date | None,
     exclusive_end_date: date | None,
-) -> Query[models.Payment]:
-    query = db.query(models.Payment)
+) -> Select[tuple[models.Payment]]:
+    query = select(models.Payment)
     if inclusive_start_date is not None:
-        query = query.filter(models.Payment.date >= inclusive_start_date)
+        query = query.where(models.Payment.date >= inclusive_start_date)
     if exclusive_end_date is not None:
-        query = query.filter(models.Payment.date < exclusive_end_date)
-    return query
+        query = query.where(models.Payment.date < exclusive_end_date)
+    return query.order_by(models.Payment.date, models.Payment.id)
+
+
+def export_payments(
+    inclusive_start_date: date | None,
+    exclusive_end_date: date | None,
+) -> Select:
+    """The rows of `read_payments` as flat columns, see `export.stream`"""
+    return read_payments(inclusive_start_date, exclusive_end_date).with_only_columns(
+        models.Payment.id,
+        models.Payment.order_id,
+        models.Payment.date,
+        models.Payment.method,
+        models.Payment.amount,
+        models.Payment.date_created,
+        models.Payment.date_modified,
+    )
 
 
 def update_payment(db: Session, payment_id: int, payment: schemas.PaymentEdit) -> models.Order:
@@ -223,10 +315,13 @@ def update_payment(db: Session, payment_id: int, payment: schemas.PaymentEdit) -
     if db_payment.order_id != payment.order_id:
         raise HTTPException(400, "Invalid payment id")
 
+    previous = _payment_rollup(db_payment, -1)
     d = payment.dict(exclude={"id", "order_id"}, exclude_unset=True)
     for attr, value in d.items():
         setattr(db_payment, attr, value)
     db.add(db_payment)
+    _apply_rollups(db, payments=[previous, _payment_rollup(db_payment)])
+    update_order_totals(db, [db_payment.order_id])
     db.commit()
     return db_payment.order
 
@@ -236,6 +331,8 @@ def delete_payment(db: Session, payment_id: int) -> models.Order:
     if db_payment is None:
         raise HTTPException(404, "Payment not found")
     db.delete(db_payment)
+    _apply_rollups(db, payments=[_payment_rollup(db_payment, -1)])
+    update_order_totals(db, [db_payment.order_id])
     db.commit()
     return db.query(models.Order).filter(models.Order.id == db_payment.order_id).one()
 
@@ -250,6 +347,9 @@ def read_order_item(db: Session, order_item_id: int) -> models.OrderItem | None:
 def create_order_item(db: Session, order_item: schemas.OrderItemCreate) -> models.Order:
     db_order_item = models.OrderItem(**order_item.dict())
     db.add(db_order_item)
+    db_order = db.query(models.Order).filter(models.Order.id == order_item.order_id).one()
+    _apply_rollups(db, order_items=[_order_item_rollup(db_order_item, db_order)])
+    update_order_totals(db, [db_order.id])
     db.commit()
     return db_order_item.order
 
@@ -262,10 +362,15 @@ def update_order_item(
         raise HTTPException(404, "Order item not found")
     if db_order_item.order_id != order_item.order_id:
         raise HTTPException(400, "Invalid order id")
+    previous = _order_item_rollup(db_order_item, db_order_item.order, -1)
     d = order_item.dict(exclude={"id", "order_id"}, exclude_unset=True)
     for attr, value in d.items():
         setattr(db_order_item, attr, value)
     db.add(db_order_item)
+    _apply_rollups(
+        db, order_items=[previous, _order_item_rollup(db_order_item, db_order_item.order)]
+    )
+    update_order_totals(db, [db_order_item.order_id])
     db.commit()
     return db_order_item.order
 
@@ -275,12 +380,29 @@ def delete_order_item(db: Session, order_item_id: int) -> models.Order:
     if db_order_item is None:
         raise HTTPException(404, detail="Order item not found")
     db.delete(db_order_item)
+    _apply_rollups(db, order_items=[_order_item_rollup(db_order_item, db_order_item.order, -1)])
+    update_order_totals(db, [db_order_item.order_id])
     db.commit()
     return db.query(models.Order).filter(models.Order.id == db_order_item.order_id).one()
 
 
 # Order
 
+# Everything schemas.Order serializes, loaded in a fixed number of queries regardless of page size:
+# many-to-one relationships are joined onto the order row, collections are fetched with one
+# "IN" query per relationship.
+_ORDER_GRAPH = (
+    joinedload(models.Order.customer),
+    joinedload(models.Order.campaign),
+    selectinload(models.Order.order_items)
+    .joinedload(models.OrderItem.menu_item)
+    .joinedload(models.MenuItem.category),
+    selectinload(models.Order.payments),
+)
+
+# The day an order counts towards, in SQL, see _order_date
+_ORDER_DATE = func.coalesce(models.Order.date_ordered, func.date(models.Order.date_created))
+
 
 def create_order(db: Session, order: schemas.OrderCreate) -> models.Order:
     if len(order.order_items) == 0:
@@ -288,43 +410,268 @@ def create_order(db: Session, order: schemas.OrderCreate) -> models.Order:
 
     db_order = models.Order(**order.dict(exclude={"order_items", "payments"}))
     db.add(db_order)
-    db.commit()
+    db.flush()
 
+    db_order_items = []
     for order_item in order.order_items:
         db_order_item = models.OrderItem(**order_item.dict(), order_id=db_order.id)
         db.add(db_order_item)
+        db_order_items.append(db_order_item)
 
+    db_payments = []
     for payment in order.payments:
         db_payment = models.Payment(**payment.dict(), order_id=db_order.id)
         db.add(db_payment)
+        db_payments.append(db_payment)
 
+    _apply_rollups(
+        db,
+        payments=[_payment_rollup(p) for p in db_payments],
+        order_items=[_order_item_rollup(item, db_order) for item in db_order_items],
+    )
+    update_order_totals(db, [db_order.id])
     db.commit()
     return db_order
 
 
+def create_orders(db: Session, orders: list[schemas.OrderCreate]) -> list[schemas.OrderBulkResult]:
+    """
+    Create many orders in a single transaction. Referenced ids are validated with one query per
+    table up front, then orders, order items and payments are each inserted in one batch.
+    Invalid orders are skipped and reported, the valid ones are still created.
+    """
+
+    def existing_ids(model: type[models.Base], ids: set[int]) -> set[int]:
+        if not ids:
+            return set()
+        return set(db.scalars(select(model.id).where(model.id.in_(ids))))
+
+    customer_ids = existing_ids(models.Customer, {order.customer_id for order in orders})
+    campaign_ids = existing_ids(
+        models.Campaign, {order.campaign_id for order in orders if order.campaign_id is not None}
+    )
+    menu_item_ids = existing_ids(
+        models.MenuItem, {item.menu_item_id for order in orders for item in order.order_items}
+    )
+
+    results: list[schemas.OrderBulkResult] = []
+    valid: list[tuple[schemas.OrderBulkResult, schemas.OrderCreate]] = []
+    for index, order in enumerate(orders):
+        result = schemas.OrderBulkResult(index=index, id=None, error=None)
+        results.append(result)
+        missing_items = {item.menu_item_id for item in order.order_items} - menu_item_ids
+        if len(order.order_items) == 0:
+            result.error = "An order requires at least 1 item"
+        elif order.customer_id not in customer_ids:
+            result.error = f"Customer {order.customer_id} does not exist"
+        elif order.campaign_id is not None and order.campaign_id not in campaign_ids:
+            result.error = f"Campaign {order.campaign_id} does not exist"
+        elif missing_items:
+            result.error = f"MenuItem {min(missing_items)} does not exist"
+        else:
+            valid.append((result, order))
+    if not valid:
+        return results
+
+    db_orders = [
+        models.Order(**order.dict(exclude={"order_items", "payments"})) for _, order in valid
+    ]
+    db.add_all(db_orders)
+    db.flush()  # a single batched INSERT .. RETURNING id
+
+    order_items, payments = [], []
+    for (result, order), db_order in zip(valid, db_orders):
+        result.id = db_order.id
+        order_items += [{**item.dict(), "order_id": db_order.id} for item in order.order_items]
+        payments += [{**payment.dict(), "order_id": db_order.id} for payment in order.payments]
+    db.execute(insert(models.OrderItem), order_items)
+    if payments:
+        db.execute(insert(models.Payment), payments)
+
+    orders_by_id = {db_order.id: db_order for db_order in db_orders}
+    _apply_rollups(
+        db,
+        payments=[(1, p["date"], p["method"], p["amount"]) for p in payments],
+        order_items=[
+            _order_item_rollup(models.OrderItem(**item), orders_by_id[item["order_id"]])
+            for item in order_items
+        ],
+    )
+    update_order_totals(db, orders_by_id)
+    db.commit()
+    return results
+
+
 def read_order(db: Session, order_id: int) -> models.Order | None:
-    return db.query(models.Order).filter(models.Order.id == order_id).first()
+    return db.query(models.Order).options(*_ORDER_GRAPH).filter(models.Order.id == order_id).first()
+
+
+def read_order_version(db: Session, order_id: int) -> Row | None:
+    """
+    See `etag`. Covers everything `_ORDER_GRAPH` loads, in a single query: the order items and
+    payments are aggregated by scalar subqueries, using their order_id indexes.
+    """
+
+    def order_items(aggregate):
+        return (
+            select(aggregate)
+            .select_from(models.OrderItem)
+            .join(models.MenuItem, models.OrderItem.menu_item_id == models.MenuItem.id)
+            .join(models.MenuCategory, models.MenuItem.category_id == models.MenuCategory.id)
+            .where(models.OrderItem.order_id == models.Order.id)
+            .scalar_subquery()
+        )
+
+    def payments(aggregate):
+        return select(aggregate).where(models.Payment.order_id == models.Order.id).scalar_subquery()
+
+    query = (
+        select(
+            models.Order.id,
+            models.Order.date_modified,
+            models.Customer.date_modified,
+            models.Campaign.date_modified,
+            order_items(func.count(models.OrderItem.id)),
+            order_items(func.max(models.OrderItem.date_modified)),
+            order_items(func.max(models.MenuItem.date_modified)),
+            order_items(func.max(models.MenuCategory.date_modified)),
+            payments(func.count(models.Payment.id)),
+            payments(func.max(models.Payment.date_modified)),
+        )
+        .join(models.Customer, models.Order.customer_id == models.Customer.id)
+        .outerjoin(models.Campaign, models.Order.campaign_id == models.Campaign.id)
+        .where(models.Order.id == order_id)
+    )
+    return db.execute(query).first()
 
 
-def read_orders(db: Session, completed: bool) -> Query[models.Order]:
-    return db.query(models.Order).filter(models.Order.completed == completed)
+def read_orders(completed: bool | None, unpaid: bool | None = None) -> Select[tuple[models.Order]]:
+    query = select(models.Order).options(*_ORDER_GRAPH)
+    if completed is not None:
+        query = query.where(models.Order.completed == completed)
+    if unpaid is not None:
+        # `+ 0`: not the expression of ix_orders_balance_due. SQLite would otherwise use that index
+        # and sort every matching order, rather than read a page in order off
+        # ix_orders_completed_date_created and filter it
+        balance_due = models.Order.balance_due + 0
+        query = query.where(balance_due > 0 if unpaid else balance_due <= 0)
+    return query.order_by(models.Order.date_created, models.Order.id)
+
+
+def export_orders(
+    inclusive_start_date: date | None,
+    exclusive_end_date: date | None,
+) -> Select:
+    """Orders with their customer's name and totals as flat columns, see `export.stream`"""
+    query = select(
+        models.Order.id,
+        _ORDER_DATE.label("date"),
+        models.Order.customer_id,
+        models.Customer.name.label("customer_name"),
+        models.Order.campaign_id,
+        models.Order.date_ordered,
+        models.Order.date_delivered,
+        models.Order.completed,
+        models.Order.subtotal,
+        models.Order.price_adjustment,
+        models.Order.total,
+        models.Order.amount_paid,
+        models.Order.balance_due,
+        models.Order.notes,
+        models.Order.date_created,
+        models.Order.date_modified,
+    ).join(models.Customer, models.Order.customer_id == models.Customer.id)
+    if inclusive_start_date is not None:
+        query = query.where(_ORDER_DATE >= inclusive_start_date)
+    if exclusive_end_date is not None:
+        query = query.where(_ORDER_DATE < exclusive_end_date)
+    return query.order_by(models.Order.id)
 
 
 def update_order(db: Session, order_id: int, order: schemas.OrderEdit) -> models.Order:
     db_order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if db_order is None:
         raise HTTPException(404, "Order not found")
+    # the order's date and campaign determine where its items are rolled up
+    previous = [_order_item_rollup(item, db_order, -1) for item in db_order.order_items]
     for attr, value in order.dict(exclude={"id"}, exclude_unset=True).items():
         setattr(db_order, attr, value)
     db.add(db_order)
+    current = [_order_item_rollup(item, db_order) for item in db_order.order_items]
+    _apply_rollups(db, order_items=previous + current)
+    update_order_totals(db, [order_id])  # price_adjustment is part of the total
     db.commit()
     return db_order
 
 
+def update_orders(db: Session, orders: schemas.OrderBulkEdit) -> int:
+    """
+    Apply `orders.edit` to every selected order in a single UPDATE, rather than loading and
+    saving each order. Returns the number of orders updated.
+
+    An order's date and campaign decide where its items are rolled up: editing them also moves the
+    selected orders' items out of their rollups before the UPDATE and back in after it, each in a
+    single INSERT ... SELECT.
+    """
+    order = models.Order
+    values = orders.edit.dict(exclude_unset=True)
+    if (customer_id := values.get("customer_id")) is not None:
+        if read_customer(db, customer_id) is None:
+            raise HTTPException(404, f"Customer {customer_id} does not exist")
+    if (campaign_id := values.get("campaign_id")) is not None:
+        if read_campaign(db, campaign_id) is None:
+            raise HTTPException(404, f"Campaign {campaign_id} does not exist")
+
+    conditions = []
+    if orders.ids is not None:
+        conditions.append(order.id.in_(orders.ids))
+    if orders.filter is not None:
+        order_filter = orders.filter
+        if order_filter.completed is not None:
+            conditions.append(order.completed == order_filter.completed)
+        if order_filter.unpaid is not None:
+            unpaid = order_filter.unpaid
+            conditions.append(order.balance_due > 0 if unpaid else order.balance_due <= 0)
+        if order_filter.customer_id is not None:
+            conditions.append(order.customer_id == order_filter.customer_id)
+        if order_filter.campaign_id is not None:
+            conditions.append(order.campaign_id == order_filter.campaign_id)
+        if order_filter.inclusive_start_date is not None:
+            conditions.append(_ORDER_DATE >= order_filter.inclusive_start_date)
+        if order_filter.exclusive_end_date is not None:
+            conditions.append(_ORDER_DATE < order_filter.exclusive_end_date)
+
+    if "price_adjustment" in values:
+        # the total is derived from it, see update_order_totals
+        values["total"] = func.round(order.subtotal + values["price_adjustment"], 2)
+    moves_rollups = "date_ordered" in values or "campaign_id" in values
+    if moves_rollups:
+        # the edit may change which orders the filter matches, pin them down by id
+        rows = db.execute(select(order.id, _ORDER_DATE).where(*conditions)).all()
+        conditions = [order.id.in_([order_id for order_id, _ in rows])]
+        _roll_up_order_items(db, conditions, -1)
+
+    result = db.execute(
+        update(order).where(*conditions).values(values),
+        execution_options={"synchronize_session": "fetch"},
+    )
+    if moves_rollups:
+        _roll_up_order_items(db, conditions)
+        # only the previous rollups lost order items
+        _delete_empty_rollups(db, models.OrderItemRollup, "order_items", {day for _, day in rows})
+    db.commit()
+    return result.rowcount
+
+
 def delete_order(db: Session, order_id: int) -> bool:
     db_order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if db_order is None:
         raise HTTPException(404, "Order not found")
+    _apply_rollups(
+        db,
+        payments=[_payment_rollup(p, -1) for p in db_order.payments],
+        order_items=[_order_item_rollup(item, db_order, -1) for item in db_order.order_items],
+    )
     for db_order_item in db_order.order_items:
         db.delete(db_order_item)
     for db_payment in db_order.payments:
@@ -332,3 +679,318 @@ def delete_order(db: Session, order_id: int) -> bool:
     db.delete(db_order)
     db.commit()
     return True
+
+
+def update_order_totals(db: Session, order_ids: Collection[int] | None = None):
+    """
+    Recompute the denormalized totals of the given orders (all orders if None) from their order
+    items and payments, in a single UPDATE. Amounts are rounded to cents, so that the balance due
+    of a fully paid order is exactly 0.
+    """
+    db.flush()
+    order = models.Order
+    subtotal = (
+        select(func.sum(models.OrderItem.quantity * models.OrderItem.charged_price))
+        .where(models.OrderItem.order_id == order.id)
+        .scalar_subquery()
+    )
+    amount_paid = (
+        select(func.sum(models.Payment.amount))
+        .where(models.Payment.order_id == order.id)
+        .scalar_subquery()
+    )
+    subtotal = func.round(func.coalesce(subtotal, 0.0), 2)
+    query = update(order).values(
+        subtotal=subtotal,
+        total=func.round(subtotal + func.coalesce(order.price_adjustment, 0.0), 2),
+        amount_paid=func.round(func.coalesce(amount_paid, 0.0), 2),
+        # derived values, not an edit of the order itself
+        date_modified=order.date_modified,
+    )
+    if order_ids is not None:
+        query = query.where(order.id.in_(order_ids))
+    db.execute(query, execution_options={"synchronize_session": "fetch"})
+
+
+# Rollups
+#
+# models.PaymentRollup and models.OrderItemRollup hold running totals for the reports. Every crud
+# function writing payments or order items (or an order's date or campaign, which decide where its
+# items are rolled up) applies its change to them as deltas, in the same transaction.
+
+_PaymentDelta = tuple[int, date, str, float]  # sign, date, method, amount
+# sign, date, menu item, campaign, quantity, revenue
+_OrderItemDelta = tuple[int, date, int, int | None, float, float]
+
+
+def _order_date(order: models.Order) -> date:
+    return order.date_ordered or order.date_created.date()
+
+
+def _payment_rollup(payment: models.Payment, sign: int = 1) -> _PaymentDelta:
+    return sign, payment.date, payment.method, payment.amount
+
+
+def _order_item_rollup(
+    order_item: models.OrderItem, order: models.Order, sign: int = 1
+) -> _OrderItemDelta:
+    return (
+        sign,
+        _order_date(order),
+        order_item.menu_item_id,
+        order.campaign_id,
+        order_item.quantity,
+        order_item.quantity * order_item.charged_price,
+    )
+
+
+def _apply_rollups(
+    db: Session,
+    payments: Sequence[_PaymentDelta] = (),
+    order_items: Sequence[_OrderItemDelta] = (),
+):
+    payment_deltas: dict[tuple[date, str], list] = defaultdict(lambda: [0.0, 0])
+    for sign, day, method, amount in payments:
+        delta = payment_deltas[(day, method)]
+        delta[0] += sign * amount
+        delta[1] += sign
+    _upsert_rollups(
+        db,
+        models.PaymentRollup,
+        ("date", "method"),
+        ("amount", "payments"),
+        [
+            {"date": day, "method": method, "amount": amount, "payments": count}
+            for (day, method), (amount, count) in payment_deltas.items()
+            if amount or count
+        ],
+    )
+
+    order_item_deltas: dict[tuple[date, int, int | None], list] = defaultdict(lambda: [0.0, 0.0, 0])
+    for sign, day, menu_item_id, campaign_id, quantity, revenue in order_items:
+        delta = order_item_deltas[(day, menu_item_id, campaign_id)]
+        delta[0] += sign * quantity
+        delta[1] += sign * revenue
+        delta[2] += sign
+    _upsert_rollups(
+        db,
+        models.OrderItemRollup,
+        models.OrderItemRollup.key,
+        ("quantity", "revenue", "order_items"),
+        [
+            {
+                "date": day,
+                "menu_item_id": menu_item_id,
+                "campaign_id": campaign_id,
+                "quantity": quantity,
+                "revenue": revenue,
+                "order_items": count,
+            }
+            for (day, menu_item_id, campaign_id), (quantity, revenue, count) in (
+                order_item_deltas.items()
+            )
+            if quantity or revenue or count
+        ],
+    )
+
+
+_ROLLUP_UPSERT_BATCH = 1000  # rows per INSERT, sqlite caps the number of bound parameters
+
+
+def _upsert_rollups(
+    db: Session,
+    model: type[models.PaymentRollup] | type[models.OrderItemRollup],
+    key: Sequence,
+    totals: tuple[str, ...],
+    deltas: list[dict],
+):
+    """
+    Add the `totals` of `deltas` to the rollups of `model` in the database, with INSERT ... ON
+    CONFLICT DO UPDATE rather than read-modify-write, so that concurrent transactions add up
+    instead of overwriting each other. Rollups left without payments or order items (the last of
+    `totals`) are then deleted.
+    """
+    if not deltas:
+        return
+    now = models.utcnow()
+    for start in range(0, len(deltas), _ROLLUP_UPSERT_BATCH):
+        rows = [
+            {**delta, "date_created": now, "date_modified": now}
+            for delta in deltas[start : start + _ROLLUP_UPSERT_BATCH]
+        ]
+        db.execute(_add_on_conflict(sqlite_insert(model).values(rows), model, key, totals))
+    count = totals[-1]
+    if any(delta[count] < 0 for delta in deltas):
+        _delete_empty_rollups(db, model, count, {delta["date"] for delta in deltas})
+
+
+def _add_on_conflict(
+    query: Insert, model: type[models.Base], key: Sequence, totals: tuple[str, ...]
+) -> Insert:
+    """`query`, an INSERT into `model`, adding its `totals` to the rollups it conflicts with"""
+    return query.on_conflict_do_update(
+        index_elements=key,
+        set_={
+            **{name: getattr(model, name) + query.excluded[name] for name in totals},
+            "date_modified": query.excluded.date_modified,
+        },
+    )
+
+
+def _delete_empty_rollups(
+    db: Session,
+    model: type[models.PaymentRollup] | type[models.OrderItemRollup],
+    count: str,
+    days: Collection[date],
+):
+    db.execute(delete(model).where(model.date.in_(days), getattr(model, count) <= 0))
+
+
+def _roll_up_order_items(db: Session, conditions: list, sign: int = 1):
+    """
+    Add (or with `sign` -1, subtract) the items of the orders matching `conditions` to their
+    rollups, in a single INSERT ... SELECT ... GROUP BY.
+    """
+    now = models.utcnow()
+    item = models.OrderItem
+    query = sqlite_insert(models.OrderItemRollup).from_select(
+        [
+            "date_created",
+            "date_modified",
+            "date",
+            "menu_item_id",
+            "campaign_id",
+            "quantity",
+            "revenue",
+            "order_items",
+        ],
+        select(
+            literal(now, models.DateTimeUTC),
+            literal(now, models.DateTimeUTC),
+            _ORDER_DATE,
+            item.menu_item_id,
+            models.Order.campaign_id,
+            sign * func.sum(item.quantity),
+            sign * func.sum(item.quantity * item.charged_price),
+            sign * func.count(),
+        )
+        .join(models.Order, item.order_id == models.Order.id)
+        .where(*conditions)
+        .group_by(_ORDER_DATE, item.menu_item_id, models.Order.campaign_id),
+    )
+    totals = ("quantity", "revenue", "order_items")
+    db.execute(_add_on_conflict(query, models.OrderItemRollup, models.OrderItemRollup.key, totals))
+
+
+def rebuild_rollups(db: Session):
+    """Recompute all rollups from the raw tables"""
+    db.execute(delete(models.PaymentRollup))
+    db.execute(delete(models.OrderItemRollup))
+    now = models.utcnow()
+    db.execute(
+        insert(models.PaymentRollup).from_select(
+            ["date_created", "date_modified", "date", "method", "amount", "payments"],
+            select(
+                literal(now, models.DateTimeUTC),
+                literal(now, models.DateTimeUTC),
+                models.Payment.date,
+                models.Payment.method,
+                func.sum(models.Payment.amount),
+                func.count(),
+            ).group_by(models.Payment.date, models.Payment.method),
+        )
+    )
+    db.execute(
+        insert(models.OrderItemRollup).from_select(
+            [
+                "date_created",
+                "date_modified",
+                "date",
+                "menu_item_id",
+                "campaign_id",
+                "quantity",
+                "revenue",
+                "order_items",
+            ],
+            select(
+                literal(now, models.DateTimeUTC),
+                literal(now, models.DateTimeUTC),
+                _ORDER_DATE,
+                models.OrderItem.menu_item_id,
+                models.Order.campaign_id,
+                func.sum(models.OrderItem.quantity),
+                func.sum(models.OrderItem.quantity * models.OrderItem.charged_price),
+                func.count(),
+            )
+            .join(models.Order, models.OrderItem.order_id == models.Order.id)
+            .group_by(_ORDER_DATE, models.OrderItem.menu_item_id, models.Order.campaign_id),
+        )
+    )
+    db.commit()
+
+
+def _rollup_date_range(
+    query: Select,
+    model: type[models.PaymentRollup] | type[models.OrderItemRollup],
+    inclusive_start_date: date | None,
+    exclusive_end_date: date | None,
+) -> Select:
+    if inclusive_start_date is not None:
+        query = query.where(model.date >= inclusive_start_date)
+    if exclusive_end_date is not None:
+        query = query.where(model.date < exclusive_end_date)
+    return query
+
+
+def read_daily_revenue(
+    db: Session, inclusive_start_date: date | None, exclusive_end_date: date | None
+) -> Sequence[Row]:
+    rollup = models.PaymentRollup
+    query = select(
+        rollup.date,
+        func.sum(rollup.amount).label("amount"),
+        func.sum(rollup.payments).label("payments"),
+    )
+    query = _rollup_date_range(query, rollup, inclusive_start_date, exclusive_end_date)
+    return db.execute(query.group_by(rollup.date).order_by(rollup.date)).all()
+
+
+def read_payment_method_revenue(
+    db: Session, inclusive_start_date: date | None, exclusive_end_date: date | None
+) -> Sequence[Row]:
+    rollup = models.PaymentRollup
+    query = select(
+        rollup.method,
+        func.sum(rollup.amount).label("amount"),
+        func.sum(rollup.payments).label("payments"),
+    )
+    query = _rollup_date_range(query, rollup, inclusive_start_date, exclusive_end_date)
+    return db.execute(query.group_by(rollup.method).order_by(rollup.method)).all()
+
+
+def read_campaign_revenue(
+    db: Session, inclusive_start_date: date | None, exclusive_end_date: date | None
+) -> Sequence[Row]:
+    rollup = models.OrderItemRollup
+    query = select(
+        rollup.campaign_id,
+        func.sum(rollup.quantity).label("quantity"),
+        func.sum(rollup.revenue).label("revenue"),
+        func.sum(rollup.order_items).label("order_items"),
+    )
+    query = _rollup_date_range(query, rollup, inclusive_start_date, exclusive_end_date)
+    return db.execute(query.group_by(rollup.campaign_id).order_by(rollup.campaign_id)).all()
+
+
+def read_menu_item_revenue(
+    db: Session, inclusive_start_date: date | None, exclusive_end_date: date | None
+) -> Sequence[Row]:
+    rollup = models.OrderItemRollup
+    query = select(
+        rollup.menu_item_id,
+        func.sum(rollup.quantity).label("quantity"),
+        func.sum(rollup.revenue).label("revenue"),
+        func.sum(rollup.order_items).label("order_items"),
+    )
+    query = _rollup_date_range(query, rollup, inclusive_start_date, exclusive_end_date)
+    return db.execute(query.group_by(rollup.menu_item_id).order_by(rollup.menu_item_id)).all()
@@ -1,16 +1,92 @@
 import sqlalchemy
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.orm import sessionmaker
 
 from src import settings
 
+# Applied to every new SQLite connection. WAL lets readers and a writer work concurrently, and
+# busy_timeout makes a writer wait for the lock instead of failing with "database is locked".
+_SQLITE_PRAGMAS = {
+    "journal_mode": settings.SQLITE_JOURNAL_MODE,
+    "synchronous": settings.SQLITE_SYNCHRONOUS,
+    "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+    "mmap_size": settings.SQLITE_MMAP_SIZE,
+    "cache_size": settings.SQLITE_CACHE_SIZE,
+}
 
-def _create_engine():
-    connect_args = None
-    if "sqlite" in settings.SQLALCHEMY_DATABASE_URL:
-        connect_args = {"check_same_thread": False}
-    return sqlalchemy.create_engine(settings.SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in _SQLITE_PRAGMAS.items():
+        if value != "":
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
 
-engine = _create_engine()
+
+def _set_sqlite_query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+
+
+def _is_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite"
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return _is_sqlite(url) and url.database in (None, "", ":memory:")
+
+
+def _pool_options(url: URL) -> dict:
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if _is_sqlite_memory(url):
+        # one connection per thread (or a single static one), there's no pool to size
+        return options
+    return {
+        **options,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def _create_engine(database_url: str):
+    url = make_url(database_url)
+    connect_args = {}
+    if _is_sqlite(url):
+        connect_args = {
+            "check_same_thread": False,
+            "cached_statements": settings.SQLITE_STATEMENT_CACHE_SIZE,
+        }
+    engine = sqlalchemy.create_engine(url, connect_args=connect_args, **_pool_options(url))
+    if _is_sqlite(url):
+        sqlalchemy.event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def _create_read_engine(database_url: str):
+    url = make_url(database_url)
+    if database_url == settings.SQLALCHEMY_DATABASE_URL and _is_sqlite_memory(url):
+        return engine  # every connection to :memory: is a database of its own
+    read_engine = _create_engine(database_url)
+    if _is_sqlite(url):
+        sqlalchemy.event.listen(read_engine, "connect", _set_sqlite_query_only)
+    return read_engine
+
+
+engine = _create_engine(settings.SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+read_engine = _create_read_engine(settings.SQLALCHEMY_READ_DATABASE_URL)
+
+# the read database is a replica, which may lag behind the primary
+has_replica = settings.SQLALCHEMY_READ_DATABASE_URL != settings.SQLALCHEMY_DATABASE_URL
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# every engine by role, for the engine events of metrics.py and slow_queries.py
+engines = {"primary": engine}
+if read_engine is not engine:
+    engines["read"] = read_engine
@@ -1,24 +1,58 @@
-from fastapi import Depends, HTTPException, Request
+from fastapi import Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from starlette.status import HTTP_403_FORBIDDEN
 
-from src import auth, crud, database, models
+from src import auth, crud, database, models, settings
 
+# set on clients writing to the primary, see get_read_db
+READ_PRIMARY_COOKIE = "read_primary"
 
-def get_db():
-    db = database.SessionLocal()
+
+def _session(session_factory):
+    db = session_factory()
     try:
         yield db
     finally:
         db.close()
 
 
+def get_db(request: Request, response: Response):
+    """Session on the primary database, for routes that write"""
+    if database.has_replica and request.method != "GET":
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            "1",
+            max_age=settings.READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="strict",
+        )
+    yield from _session(database.SessionLocal)
+
+
+def get_read_db(request: Request):
+    """
+    Session on the read database, for GET routes.
+
+    A replica may not have caught up with a client's own writes yet: for a few seconds after
+    writing, clients read from the primary instead (read your writes).
+    """
+    if database.has_replica and READ_PRIMARY_COOKIE in request.cookies:
+        yield from _session(database.SessionLocal)
+    else:
+        yield from _session(database.ReadSessionLocal)
+
+
 def get_authorized_user(
     request: Request,
     db: Session = Depends(get_db),
 ) -> models.User:
+    token = request.cookies.get("token")
+    if token is not None and (user := auth.session_cache.get(token)) is not None:
+        return user
     session = auth.verify_cookie(request)
+    generation = auth.session_cache.generation()
     user = crud.read_user(db, session["username"])
     if user is None:
         raise HTTPException(HTTP_403_FORBIDDEN, "Could not validate credentials")
+    auth.session_cache.set(request.cookies["token"], user, session["expires_at"], generation)
     return user
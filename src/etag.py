@@ -0,0 +1,39 @@
+"""
+Weak ETags for single-resource GETs.
+
+A resource's ETag is computed from a cheap "version" lookup (`crud.read_*_version`): the ids and
+`date_modified` of every row the response is built from, plus the number of rows in its
+collections so that deleting a child also changes it. A request whose `If-None-Match` matches gets
+a 304 without the resource being loaded or serialized.
+"""
+import hashlib
+from collections.abc import Sequence
+from typing import Any
+
+from fastapi import Request, Response
+
+
+def make_etag(version: Sequence[Any]) -> str:
+    digest = hashlib.blake2b(repr(tuple(version)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match matches `etag`, using weak comparison"""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def not_modified(request: Request, response: Response, version: Sequence[Any]) -> Response | None:
+    """
+    A 304 response if the client's copy of the resource at `version` is current. Otherwise None,
+    and the ETag is added to the route's `response`.
+    """
+    etag = make_etag(version)
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
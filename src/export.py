@@ -0,0 +1,64 @@
+"""
+Streaming exports.
+
+The query runs on a server-side cursor (`yield_per`) and each batch of rows is written to the
+response as soon as it is fetched, so memory use stays flat however many rows are exported.
+Rows are plain column tuples: no ORM objects or pydantic models are built.
+"""
+import csv
+import io
+import json
+from collections.abc import Iterator
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Result, Select
+from sqlalchemy.orm import Session
+
+from src import schemas
+
+BATCH_SIZE = 1000
+
+_MEDIA_TYPES = {
+    schemas.ExportFormat.CSV: "text/csv",
+    schemas.ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunks(result: Result) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result.keys())
+    for rows in result.partitions():
+        writer.writerows([_serialize(v) for v in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # no rows, only the header
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(result: Result) -> Iterator[str]:
+    keys = list(result.keys())
+    for rows in result.partitions():
+        yield "".join(json.dumps(dict(zip(keys, row)), default=_serialize) + "\n" for row in rows)
+
+
+def stream(
+    db: Session, query: Select, format: schemas.ExportFormat, filename: str
+) -> StreamingResponse:
+    """Stream the rows of `query` as a `filename`.csv or `filename`.ndjson attachment"""
+    result = db.execute(query, execution_options={"yield_per": BATCH_SIZE})
+    chunks = _csv_chunks(result) if format == schemas.ExportFormat.CSV else _ndjson_chunks(result)
+    return StreamingResponse(
+        chunks,
+        media_type=_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format.value}"'},
+    )
@@ -0,0 +1,157 @@
+"""
+Structured, non-blocking logging.
+
+Records are written as one JSON object per line. Loggers only put records on a queue (a
+`QueueHandler` on the root logger): formatting, tracebacks included, and writing to stdout happen
+on the thread of a `QueueListener`, so a slow disk or pipe never adds latency to a request.
+
+Records logged while handling a request carry its id and route. `AccessLogMiddleware` logs one
+record per request on the "bakery.access" logger, with its status, latency and database time.
+"""
+import copy
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import IO, Any
+
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src import metrics
+
+access_logger = logging.getLogger("bakery.access")
+
+REQUEST_ID_HEADER = "x-request-id"
+_VALID_REQUEST_ID = re.compile(r"[\w.:-]{1,64}")
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# attributes of every LogRecord, anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info))
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Unlike the default, doesn't format the record (nor its traceback) on the logging thread:
+        only the message's arguments are merged, they may change once the call returns.
+        """
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        record.request_id = request_id.get()
+        record.route = metrics.current_route()
+        return record
+
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def setup(level: int = logging.INFO, stream: IO[str] | None = None):
+    """Route every log record through a queue to a JSON stream handler (stdout by default)"""
+    global _listener
+    if _listener is not None:
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(records, stream_handler)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_QueueHandler(records))
+    root.setLevel(level)
+    # uvicorn's loggers have handlers of their own, and its access log is replaced by ours
+    for name in ("uvicorn", "uvicorn.error"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
+
+
+def shutdown():
+    """Write the queued records and stop the listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, _QueueHandler)]:
+        root.removeHandler(handler)
+
+
+def _request_id(scope: Scope) -> str:
+    for name, value in scope["headers"]:
+        if name == REQUEST_ID_HEADER.encode():
+            value = value.decode("latin-1")
+            if _VALID_REQUEST_ID.fullmatch(value):
+                return value
+    return uuid.uuid4().hex
+
+
+class AccessLogMiddleware:
+    """
+    Logs every request, and echoes its id in the X-Request-ID response header (the client's if it
+    sent one). Must run inside `metrics.MetricsMiddleware`, whose request stats it reports.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        current_id = _request_id(scope)
+        token = request_id.set(current_id)
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER.encode(), current_id.encode()),
+                ]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            stats = metrics.request_stats.get()
+            access_logger.info(
+                "%s %s %s",
+                scope["method"],
+                scope["path"],
+                status,
+                extra={
+                    "status": status,
+                    "latency_ms": round(latency_ms, 3),
+                    "db_ms": round(stats.db_seconds * 1000, 3) if stats else None,
+                    "db_statements": stats.statements if stats else None,
+                },
+            )
+            request_id.reset(token)
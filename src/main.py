@@ -4,25 +4,47 @@ import traceback
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi_pagination import add_pagination
 from sqlalchemy.exc import IntegrityError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from src import crud, routes, settings
+from src import (
+    auth,
+    cache,
+    crud,
+    database,
+    logs,
+    metrics,
+    routes,
+    settings,
+    slow_queries,
+    typeahead,
+)
 
 logger = logging.getLogger("bakery")
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 
 @app.on_event("startup")
 def startup():
-    logging.basicConfig(level=logging.INFO)
+    logs.setup(logging.INFO)
     if settings.ENV == "dev":
         logger.setLevel(logging.DEBUG)
     if logger.isEnabledFor(logging.INFO):
-        pretty_settings = (f"{k.lower():<25} {v}" for k, v in sorted(settings.dump().items()))
+        width = max(map(len, settings.dump()))
+        pretty_settings = (f"{k.lower():<{width}} {v}" for k, v in sorted(settings.dump().items()))
         logger.info("Settings\n%s", "\n".join(pretty_settings))
+    if settings.TYPEAHEAD_BUILD_ON_STARTUP:
+        with database.SessionLocal() as db:
+            typeahead.menu_index.build(db)
+
+
+@app.on_event("shutdown")
+def shutdown():
+    auth.shutdown_hash_pool()
+    logs.shutdown()
 
 
 @app.exception_handler(IntegrityError)
@@ -32,24 +54,49 @@ def handle_integrity_error(request: Request, exc: IntegrityError):
         return JSONResponse({"detail": error_msg}, 400)
 
 
-async def catch_exceptions_middleware(request: Request, call_next):
+@app.exception_handler(cache.CacheHit)
+def handle_cache_hit(request: Request, exc: cache.CacheHit):
+    return exc.response
+
+
+class CatchExceptionsMiddleware:
     """
     Ensure CORS headers are added to response when an unhandled exception occurs:
     https://github.com/tiangolo/fastapi/issues/775#issuecomment-592946834
+
+    A plain ASGI middleware: `app.middleware("http")` wraps every response in a streaming one,
+    which costs a task per request.
     """
-    try:
-        return await call_next(request)
-    except Exception:
-        logger.exception("Unhandled exception")
-        content: dict[str, str | list[str]] = {"detail": "Internal server error"}
-        if settings.ENV == "dev":
-            exc_type, exc_value, exc_traceback = sys.exc_info()
-            tb = traceback.format_exception(exc_type, exc_value, exc_traceback, limit=25)
-            content.update(traceback=tb)
-        return JSONResponse(content, status_code=500)
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        response_started = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            logger.exception("Unhandled exception")
+            if response_started:
+                raise
+            content: dict[str, str | list[str]] = {"detail": "Internal server error"}
+            if settings.ENV == "dev":
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                tb = traceback.format_exception(exc_type, exc_value, exc_traceback, limit=25)
+                content.update(traceback=tb)
+            await JSONResponse(content, status_code=500)(scope, receive, send)
 
 
-app.middleware("http")(catch_exceptions_middleware)
+app.add_middleware(CatchExceptionsMiddleware)
 
 
 app.add_middleware(
@@ -59,6 +106,10 @@ app.add_middleware(
     allow_headers=["Access-Control-Allow-Origin", "Access-Control-Allow-Headers"],
     allow_credentials=True,
 )
+app.add_middleware(logs.AccessLogMiddleware)
+# outermost, so that latencies and status codes are those the client sees
+app.add_middleware(metrics.MetricsMiddleware)
+app.include_router(routes.metrics.router)
 app.include_router(routes.auth.router, prefix="/api")
 app.include_router(routes.v1.router, prefix="/api")
 add_pagination(app)
@@ -0,0 +1,321 @@
+"""
+Prometheus metrics, exposed in the text exposition format at GET /metrics.
+
+- per route: request latency histograms and counts by status (`MetricsMiddleware`)
+- per request: the number of SQL statements executed and the time spent executing them, from
+  engine events, accumulated in a context variable the middleware sets for each request
+- per engine: connection pool checkouts, new connections and the pool's current state
+
+Metrics are per process: with several workers (see `./run.py app serve`), a scrape sees one
+worker's.
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, ExceptionContext, ExecutionContext
+from sqlalchemy.pool import QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src import database
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Registry
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(name: str, labels: Labels, value: float) -> str:
+    if labels:
+        label_text = ",".join(f'{key}="{_escape(str(v))}"' for key, v in labels)
+        return f"{name}{{{label_text}}} {value:g}"
+    return f"{name} {value:g}"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._values: defaultdict[Labels, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(labels.items())
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield _format(self.name, labels, value)
+
+
+class Gauge:
+    """Sampled when scraped"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, collect: Callable[[], dict[Labels, float]]):
+        self.name, self.help, self._collect = name, help, collect
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._collect().items():
+            yield _format(self.name, labels, value)
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name, self.help, self.buckets = name, help, tuple(buckets)
+        # per labels: [count per bucket (not cumulative) and +Inf, sum]
+        self._values: dict[Labels, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(labels.items())
+        bucket = next((i for i, le in enumerate(self.buckets) if value <= le), len(self.buckets))
+        with self._lock:
+            counts = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+        for labels, counts in values:
+            cumulative = 0.0
+            for le, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield _format(f"{self.name}_bucket", (*labels, ("le", f"{le}")), cumulative)
+            yield _format(f"{self.name}_sum", labels, counts[-1])
+            yield _format(f"{self.name}_count", labels, cumulative)
+
+
+_metrics: list[Counter | Gauge | Histogram] = []
+
+
+def _register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def exposition() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# Requests
+
+requests_total = _register(
+    Counter("bakery_http_requests_total", "HTTP requests by route and status code")
+)
+request_duration = _register(
+    Histogram(
+        "bakery_http_request_duration_seconds", "HTTP request latency by route", LATENCY_BUCKETS
+    )
+)
+request_statements = _register(
+    Histogram(
+        "bakery_http_request_db_statements",
+        "SQL statements executed per request",
+        STATEMENT_BUCKETS,
+    )
+)
+request_db_duration = _register(
+    Histogram(
+        "bakery_http_request_db_duration_seconds",
+        "Time spent executing SQL statements per request",
+        LATENCY_BUCKETS,
+    )
+)
+
+
+@dataclass
+class RequestStats:
+    scope: Scope
+    statements: int = 0
+    db_seconds: float = 0.0
+
+
+# set by MetricsMiddleware for each request, and accumulated into by the engine events
+request_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "request_stats", default=None
+)
+
+_route_templates: dict[tuple[Any, str], str] = {}
+
+
+def _route_template(scope: Scope) -> str:
+    """The path template of the route that handled the request, e.g. /api/v1/orders/{order_id}"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"  # 404s, keep unbounded paths out of the labels
+    key = (endpoint, scope["method"])
+    if key not in _route_templates:
+        _route_templates[key] = next(
+            (
+                route.path
+                for route in scope["app"].routes
+                if getattr(route, "endpoint", None) is endpoint
+                and scope["method"] in (getattr(route, "methods", None) or ())
+            ),
+            "unmatched",
+        )
+    return _route_templates[key]
+
+
+def current_route() -> str | None:
+    """The route handling the current request, if any"""
+    stats = request_stats.get()
+    return None if stats is None else f'{stats.scope["method"]} {_route_template(stats.scope)}'
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+        stats = RequestStats(scope)
+        token = request_stats.set(stats)
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_stats.reset(token)
+            labels = {"method": scope["method"], "route": _route_template(scope)}
+            requests_total.inc(**labels, status=str(status))
+            request_duration.observe(elapsed, **labels)
+            request_statements.observe(stats.statements, **labels)
+            request_db_duration.observe(stats.db_seconds, **labels)
+
+
+# Database
+
+statements_total = _register(
+    Counter("bakery_db_statements_total", "SQL statements executed, by engine")
+)
+statement_duration = _register(
+    Histogram(
+        "bakery_db_statement_duration_seconds", "SQL statement execution time", LATENCY_BUCKETS
+    )
+)
+pool_checkouts = _register(
+    Counter("bakery_db_pool_checkouts_total", "Connections checked out of the pool")
+)
+pool_connects = _register(
+    Counter("bakery_db_pool_connections_total", "New connections opened by the pool")
+)
+
+
+def _pool_state(state: Callable[[QueuePool], float]) -> Callable[[], dict[Labels, float]]:
+    def collect():
+        return {
+            (("engine", name),): state(engine.pool)
+            for name, engine in database.engines.items()
+            if isinstance(engine.pool, QueuePool)
+        }
+
+    return collect
+
+
+_register(
+    Gauge(
+        "bakery_db_pool_size",
+        "Connections the pool keeps open",
+        _pool_state(QueuePool.size),
+    )
+)
+_register(
+    Gauge(
+        "bakery_db_pool_checked_out",
+        "Connections currently checked out",
+        _pool_state(QueuePool.checkedout),
+    )
+)
+_register(
+    Gauge(
+        "bakery_db_pool_overflow",
+        "Connections open beyond the pool size",
+        _pool_state(lambda pool: max(pool.overflow(), 0)),  # negative while under the size
+    )
+)
+
+# set on the statement's ExecutionContext, which doesn't outlive the statement even if it fails
+_START_TIME = "bakery_statement_start"
+
+
+def statement_elapsed(context: ExecutionContext | None) -> float | None:
+    """
+    Seconds since the cursor started executing the statement of `context`. None for the statements
+    dialects run without a context (e.g. sequences), which aren't timed.
+    """
+    start = getattr(context, _START_TIME, None)
+    return None if start is None else time.perf_counter() - start
+
+
+def _instrument(name: str, engine: Engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            setattr(context, _START_TIME, time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if (elapsed := statement_elapsed(context)) is not None:
+            observe(elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context: ExceptionContext):
+        # failed statements don't reach after_cursor_execute, but took time all the same
+        context = exception_context.execution_context
+        if (elapsed := statement_elapsed(context)) is not None:
+            observe(elapsed)
+            delattr(context, _START_TIME)
+
+    def observe(elapsed: float):
+        statements_total.inc(engine=name)
+        statement_duration.observe(elapsed, engine=name)
+        if (stats := request_stats.get()) is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_checkouts.inc(engine=name)
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        pool_connects.inc(engine=name)
+
+
+for _name, _engine in database.engines.items():
+    _instrument(_name, _engine)
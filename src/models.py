@@ -2,16 +2,24 @@ from datetime import datetime, timezone
 from typing import Optional
 
 from sqlalchemy import (
+    DDL,
     Boolean,
     Column,
     Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     TypeDecorator,
+    UniqueConstraint,
+    column,
+    event,
+    table,
+    text,
 )
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import DeclarativeBase, Mapped, relationship
 
 
@@ -21,6 +29,7 @@ def utcnow() -> datetime:
 
 class DateTimeUTC(TypeDecorator):
     impl = DateTime
+    cache_ok = True
 
     def process_bind_param(self, value, dialect):
         assert isinstance(value, datetime)
@@ -28,6 +37,8 @@ class DateTimeUTC(TypeDecorator):
         return value
 
     def process_result_value(self, value, dialect):
+        if value is None:  # e.g. the columns of an empty LEFT OUTER JOIN
+            return None
         assert isinstance(value, datetime)
         assert value.tzinfo is None
         return value.replace(tzinfo=timezone.utc)
@@ -55,10 +66,54 @@ class Customer(Base):
     orders: Mapped[list["Order"]] = relationship("Order", back_populates="customer")
 
 
+# Full-text index of the customers, see crud.search_customers. An external content FTS5 table: it
+# only stores the index, kept in sync with the customers table by triggers. Batch migrations of the
+# customers table (copy and move) drop its triggers, they must be created again.
+customers_fts = table("customers_fts", column("rowid"), column("customers_fts"))
+
+CUSTOMERS_FTS_DDL = (
+    """
+    CREATE VIRTUAL TABLE customers_fts USING fts5(
+        name, email, phone, notes,
+        content='customers', content_rowid='id', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER customers_fts_insert AFTER INSERT ON customers BEGIN
+        INSERT INTO customers_fts(rowid, name, email, phone, notes)
+        VALUES (new.id, new.name, new.email, new.phone, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER customers_fts_delete AFTER DELETE ON customers BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, name, email, phone, notes)
+        VALUES ('delete', old.id, old.name, old.email, old.phone, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER customers_fts_update AFTER UPDATE OF name, email, phone, notes ON customers
+    BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, name, email, phone, notes)
+        VALUES ('delete', old.id, old.name, old.email, old.phone, old.notes);
+        INSERT INTO customers_fts(rowid, name, email, phone, notes)
+        VALUES (new.id, new.name, new.email, new.phone, new.notes);
+    END
+    """,
+)
+
+for statement in CUSTOMERS_FTS_DDL:
+    event.listen(Customer.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    Customer.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS customers_fts").execute_if(dialect="sqlite"),
+)
+
+
 class MenuItem(Base):
     __tablename__ = "menu_items"
     name = Column(String, index=True, nullable=False)
-    category_id = Column(Integer, ForeignKey("menu_categories.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("menu_categories.id"), index=True, nullable=False)
     description = Column(String)
     price = Column(Float, nullable=False)
     price_units = Column(String)  # $10 / dozen <-- dozen is the unit
@@ -77,8 +132,8 @@ class MenuCategory(Base):
 
 class OrderItem(Base):
     __tablename__ = "order_items"
-    menu_item_id = Column(Integer, ForeignKey("menu_items.id"), nullable=False)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    menu_item_id = Column(Integer, ForeignKey("menu_items.id"), index=True, nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True, nullable=False)
     quantity = Column(Float, nullable=False)
     menu_price = Column(Float, nullable=False)
     charged_price = Column(Float, nullable=False)
@@ -90,19 +145,34 @@ class OrderItem(Base):
 
 class Order(Base):
     __tablename__ = "orders"
-    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    __table_args__ = (
+        # matches the keyset ORDER BY of crud.read_orders, so that a page is read in order
+        # rather than sorting every matching order
+        Index("ix_orders_completed_date_created", "completed", "date_created", "id"),
+        # matches the balance_due expression, for the unpaid filter of PATCH /orders/bulk
+        Index("ix_orders_balance_due", "completed", text("(total - amount_paid)")),
+    )
+    customer_id = Column(Integer, ForeignKey("customers.id"), index=True, nullable=False)
     campaign_id = Column(Integer, ForeignKey("campaigns.id"))
     date_ordered = Column(Date)
     date_delivered = Column(Date)
     price_adjustment = Column(Float)
     notes = Column(String)
     completed = Column(Boolean, default=False)
+    # Denormalized from the order items and payments, kept up to date by crud.update_order_totals
+    subtotal = Column(Float, default=0.0, nullable=False)  # sum of quantity * charged_price
+    total = Column(Float, default=0.0, nullable=False)  # subtotal + price_adjustment
+    amount_paid = Column(Float, default=0.0, nullable=False)  # sum of payments
 
     campaign: Mapped[Optional["Campaign"]] = relationship("Campaign", back_populates="orders")
     customer: Mapped[Customer] = relationship("Customer", back_populates="orders")
     order_items: Mapped[list[OrderItem]] = relationship("OrderItem", back_populates="order")
     payments: Mapped[list["Payment"]] = relationship("Payment", back_populates="order")
 
+    @hybrid_property
+    def balance_due(self) -> float:
+        return self.total - self.amount_paid
+
 
 class Campaign(Base):
     """Promotional campaigns, example Dec 18 2021 open house"""
@@ -118,9 +188,39 @@ class Campaign(Base):
 
 class Payment(Base):
     __tablename__ = "payments"
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True, nullable=False)
     amount = Column(Float, nullable=False)
     method = Column(String, nullable=False)  # cash, paypal, zelle
-    date = Column(Date, nullable=False)
+    date = Column(Date, index=True, nullable=False)
 
     order: Mapped[Order] = relationship("Order", back_populates="payments")
+
+
+# Rollups: running totals kept up to date by crud, so reports don't scan the raw tables.
+# See crud.rebuild_rollups for their definition.
+
+
+class PaymentRollup(Base):
+    """Payments per day and method"""
+
+    __tablename__ = "payment_rollups"
+    __table_args__ = (UniqueConstraint("date", "method"),)
+    date = Column(Date, nullable=False)
+    method = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    payments = Column(Integer, nullable=False)
+
+
+class OrderItemRollup(Base):
+    """Order items per day (the order's date_ordered, else its creation date), menu item and campaign"""
+
+    __tablename__ = "order_item_rollups"
+    # NULLs are distinct in a unique index: key a rollup without a campaign as campaign 0
+    key = ("date", "menu_item_id", text("coalesce(campaign_id, 0)"))
+    __table_args__ = (Index("ix_order_item_rollups_key", *key, unique=True),)
+    date = Column(Date, nullable=False)
+    menu_item_id = Column(Integer, ForeignKey("menu_items.id"), nullable=False)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id"))
+    quantity = Column(Float, nullable=False)
+    revenue = Column(Float, nullable=False)  # sum of quantity * charged_price
+    order_items = Column(Integer, nullable=False)
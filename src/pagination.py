@@ -0,0 +1,175 @@
+"""
+Keyset (a.k.a. cursor) pagination.
+
+Pages are fetched with `WHERE (sort_key, id) > (last_sort_key, last_id) ORDER BY sort_key, id LIMIT n`
+rather than `LIMIT n OFFSET m`, so page N costs the same as page 1 and no COUNT query is needed.
+The position of the last row is handed to the client as an opaque cursor token.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Generic, Sequence, TypeVar
+
+from fastapi import HTTPException, Query
+from fastapi_pagination.api import create_page, resolve_params
+from fastapi_pagination.bases import AbstractPage, AbstractParams, CursorRawParams
+from fastapi_pagination.utils import verify_params
+from pydantic import BaseModel, Field
+from sqlalchemy import (
+    ColumnElement,
+    Date,
+    DateTime,
+    Select,
+    TypeDecorator,
+    UnaryExpression,
+    literal,
+    tuple_,
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators
+
+T = TypeVar("T")
+
+MAX_IDS = 500
+
+# the JSON types a cursor may hold for a sort key, by the key's python type
+_CURSOR_TYPES = {float: (int, float), Decimal: (int, float)}
+
+
+class KeysetParams(BaseModel, AbstractParams):
+    cursor: str | None = Query(None, description="Cursor for the next page")
+    size: int = Query(50, ge=1, le=500, description="Page size")
+
+    def to_raw_params(self) -> CursorRawParams:
+        return CursorRawParams(cursor=self.cursor, size=self.size)
+
+
+class KeysetPage(AbstractPage[T], Generic[T]):
+    items: Sequence[T]
+    next_page: str | None = Field(None, description="Cursor for the next page")
+
+    __params_type__ = KeysetParams
+
+    @classmethod
+    def create(
+        cls,
+        items: Sequence[T],
+        params: AbstractParams,
+        *,
+        next_: str | None = None,
+        **kwargs: Any,
+    ) -> "KeysetPage[T]":
+        # Not validated here: FastAPI validates the page against the route's response_model, or the
+        # route serializes it with `serialization.trusted_response`.
+        return cls.construct(items=items, next_page=next_, **kwargs)
+
+
+def _sort_keys(query: Select) -> tuple[list[ColumnElement], bool]:
+    """The ORDER BY columns of `query` and whether they are descending"""
+    keys, directions = [], set()
+    for clause in query._order_by_clauses:
+        if isinstance(clause, UnaryExpression) and clause.modifier is operators.desc_op:
+            keys.append(clause.element)
+            directions.add(True)
+        else:
+            keys.append(clause)
+            directions.add(False)
+    if not keys:
+        raise ValueError("Keyset pagination requires an ORDER BY clause")
+    if len(directions) > 1:
+        raise ValueError("Keyset pagination requires every ORDER BY column in the same direction")
+    return keys, directions.pop()
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, keys: Sequence[ColumnElement]) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        decoded = []
+        for key, value in zip(keys, values):
+            type_ = key.type.impl if isinstance(key.type, TypeDecorator) else key.type
+            if isinstance(type_, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(type_, Date):
+                value = date.fromisoformat(value)
+            else:
+                python_type = type_.python_type
+                json_types = _CURSOR_TYPES.get(python_type, python_type)
+                # bool is an int to isinstance
+                is_bool = isinstance(value, bool)
+                if not isinstance(value, json_types) or is_bool != (python_type is bool):
+                    raise ValueError(cursor)
+            decoded.append(value)
+        return decoded
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def _page_query(query: Select, raw_params: CursorRawParams) -> Select:
+    keys, descending = _sort_keys(query)
+    if raw_params.cursor:
+        values = decode_cursor(str(raw_params.cursor), keys)
+        position = tuple_(*(literal(v, k.type) for k, v in zip(keys, values)))
+        query = query.where(tuple_(*keys) < position if descending else tuple_(*keys) > position)
+    # fetch 1 extra row to find out if there is a further page
+    return query.add_columns(*keys).limit(raw_params.size + 1)
+
+
+def paginate(db: Session, query: Select, params: KeysetParams | None = None) -> Any:
+    """
+    Fetch one page of `query`, which must be ordered by a unique key, e.g. `(name, id)`.
+    Sort key columns must not contain NULLs; coalesce nullable columns in the ORDER BY.
+    """
+    params, raw_params = verify_params(params, "cursor")
+    rows = db.execute(_page_query(query, raw_params)).all()
+    next_ = None
+    if len(rows) > raw_params.size:
+        rows = rows[: raw_params.size]
+        next_ = encode_cursor(rows[-1][1:])
+    return create_page([row[0] for row in rows], params=params, next_=next_)
+
+
+def ids_param(
+    ids: str
+    | None = Query(
+        None,
+        description=f"Comma separated ids, e.g. 1,2,3 (at most {MAX_IDS}): only these, in this "
+        "order, on a single page",
+    )
+) -> list[int] | None:
+    """The `ids` query parameter of list routes, without duplicates, see `paginate_ids`"""
+    if ids is None:
+        return None
+    try:
+        parsed = list(dict.fromkeys(int(id) for id in ids.split(",") if id.strip()))
+    except ValueError:
+        raise HTTPException(400, "ids must be comma separated integers")
+    if len(parsed) > MAX_IDS:
+        raise HTTPException(400, f"At most {MAX_IDS} ids can be requested at once")
+    return parsed
+
+
+def paginate_ids(db: Session, query: Select, ids: Sequence[int]) -> Any:
+    """
+    The rows of `query` with these ids, in the order of `ids`, on a single page of the route's page
+    type: one `IN` query (plus `query`'s eager loads) rather than a request per id. Ids of rows
+    that don't exist or that `query` filters out are left out. Limit/offset pages report the limit
+    applied to `ids`, `MAX_IDS`, rather than the route's.
+    """
+    model = query.column_descriptions[0]["entity"]
+    rows = db.scalars(query.order_by(None).where(model.id.in_(ids)))
+    by_id = {row.id: row for row in rows}
+    items = [by_id[id] for id in ids if id in by_id]
+    params = resolve_params(None)
+    if params.to_raw_params().type == "cursor":
+        return create_page(items, params=params)
+    params = params.copy(update={"limit": MAX_IDS, "offset": 0})
+    return create_page(items, total=len(items), params=params)
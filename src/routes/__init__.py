@@ -1 +1 @@
-from src.routes import auth, v1
+from src.routes import auth, metrics, v1
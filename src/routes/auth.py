@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -17,17 +18,24 @@ class LoginSchema(BaseModel):
 
 
 @router.post("/login", response_model=schemas.User)
-def login(schema: LoginSchema, response: Response, db: Session = Depends(get_db)):
-    db_user = crud.read_user(db, schema.username)
+async def login(schema: LoginSchema, response: Response, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(crud.read_user, db, schema.username)
     if db_user is not None:
-        if auth.verify_password(schema.password, str(db_user.hashed_password)):
+        verified, new_hash = await auth.verify_and_update_password(
+            schema.password, str(db_user.hashed_password)
+        )
+        if verified:
+            if new_hash is not None:
+                await run_in_threadpool(crud.update_user_password, db, db_user, new_hash)
             auth.set_cookie(response, str(db_user.name))
             return schemas.User(id=db_user.id, name=db_user.name)
     raise HTTPException(400, "Username or password is incorrect")
 
 
 @router.get("/logout")
-def logout(response: Response):
+def logout(request: Request, response: Response):
+    if token := request.cookies.get("token"):
+        auth.session_cache.discard(token)
     auth.remove_cookie(response)
     response.status_code = 204
     return response
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    # unauthenticated, for Prometheus: don't expose it beyond the internal network
+    return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4")
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 
 from src.dependencies import get_authorized_user
-from src.routes.v1 import campaigns, customers, menu, orders, payments, users
+from src.routes.v1 import campaigns, customers, menu, orders, payments, reports, users
 
 router = APIRouter(
     prefix="/v1",
@@ -13,4 +13,5 @@ router.include_router(customers.router)
 router.include_router(menu.router)
 router.include_router(orders.router)
 router.include_router(payments.router)
+router.include_router(reports.router)
 router.include_router(users.router)
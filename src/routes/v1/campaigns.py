@@ -1,14 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi_pagination import LimitOffsetPage
-from fastapi_pagination.ext.sqlalchemy import paginate
+from fastapi_pagination.ext.sqlalchemy_future import paginate
 from sqlalchemy.orm import Session
 
-from src import crud, schemas
-from src.dependencies import get_db
+from src import cache, crud, etag, models, pagination, schemas
+from src.dependencies import get_db, get_read_db
 
 router = APIRouter(
     prefix="/campaigns",
     tags=["campaigns"],
+    route_class=cache.cached_route(models.Campaign),
 )
 
 
@@ -25,17 +26,24 @@ def update_campaign(
 
 
 @router.get("/{campaign_id}", response_model=schemas.Campaign)
-def get_campaign(campaign_id: int, db: Session = Depends(get_db)):
-    campaign = crud.read_campaign(db, campaign_id)
-    if campaign is None:
+def get_campaign(
+    campaign_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)
+):
+    version = crud.read_campaign_version(db, campaign_id)
+    if version is None:
         raise HTTPException(404, f"Campaign {campaign_id} not found")
-    return campaign
+    if not_modified := etag.not_modified(request, response, version):
+        return not_modified
+    return crud.read_campaign(db, campaign_id)
 
 
 @router.get("", response_model=LimitOffsetPage[schemas.Campaign])
 def get_campaigns(
-    db: Session = Depends(get_db),
+    ids: list[int] | None = Depends(pagination.ids_param),
+    db: Session = Depends(get_read_db),
 ):
     # TODO order by
-    query = crud.read_campaigns(db)
-    return paginate(query)
+    query = crud.read_campaigns()
+    if ids is not None:
+        return pagination.paginate_ids(db, query, ids)
+    return paginate(db, query)
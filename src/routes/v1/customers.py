@@ -1,10 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi_pagination import LimitOffsetPage
-from fastapi_pagination.ext.sqlalchemy import paginate
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from src import crud, schemas
-from src.dependencies import get_db
+from src import crud, etag, schemas, serialization
+from src.dependencies import get_db, get_read_db
+from src.pagination import KeysetPage, ids_param, paginate, paginate_ids
 
 router = APIRouter(
     prefix="/customers",
@@ -24,24 +23,39 @@ def update_customer(
     return crud.update_customer(db, customer_id, customer)
 
 
+@router.get("/search", response_model=KeysetPage[schemas.Customer])
+def search_customers(
+    q: str = Query(..., min_length=1, description="Words to look for in name, email, phone, notes"),
+    db: Session = Depends(get_read_db),
+):
+    query = crud.search_customers(q)
+    return serialization.trusted_response(KeysetPage[schemas.Customer], paginate(db, query))
+
+
 @router.get("/{customer_id}", response_model=schemas.Customer)
-def get_customer(customer_id: int, db: Session = Depends(get_db)):
-    customer = crud.read_customer(db, customer_id)
-    if customer is None:
+def get_customer(
+    customer_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)
+):
+    version = crud.read_customer_version(db, customer_id)
+    if version is None:
         raise HTTPException(404, f"Customer {customer_id} not found")
-    return customer
+    if not_modified := etag.not_modified(request, response, version):
+        return not_modified
+    return crud.read_customer(db, customer_id)
 
 
-@router.get("", response_model=LimitOffsetPage[schemas.Customer])
+@router.get("", response_model=KeysetPage[schemas.Customer])
 def get_customers(
     name: str | None = None,
     email: str | None = None,
     phone: str | None = None,
     orderBy: str = "name",
     descending: str | None = None,
-    db: Session = Depends(get_db),
+    ids: list[int] | None = Depends(ids_param),
+    db: Session = Depends(get_read_db),
 ):
     if orderBy and orderBy not in {"name", "email", "phone"}:
         raise HTTPException(400, "orderby must be one of name, email, phone")
-    query = crud.read_customers(db, name, email, phone, orderBy, descending is not None)
-    return paginate(query)
+    query = crud.read_customers(name, email, phone, orderBy, descending is not None)
+    page = paginate(db, query) if ids is None else paginate_ids(db, query, ids)
+    return serialization.trusted_response(KeysetPage[schemas.Customer], page)
@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from fastapi_pagination import LimitOffsetPage
-from fastapi_pagination.ext.sqlalchemy import paginate
+from fastapi_pagination.ext.sqlalchemy_future import paginate
 from sqlalchemy.orm import Session
 
-from src import crud, schemas
-from src.dependencies import get_db
+from src import cache, crud, etag, models, pagination, schemas, serialization, typeahead
+from src.dependencies import get_db, get_read_db
 
 router = APIRouter(
     prefix="/menu",
     tags=["menu"],
+    route_class=cache.cached_route(models.MenuItem, models.MenuCategory),
 )
 
 
@@ -29,7 +31,7 @@ def update_menu_category(
 
 
 @router.get("/categories/{category_id}", response_model=schemas.MenuCategory)
-def get_menu_category(category_id: int, db: Session = Depends(get_db)):
+def get_menu_category(category_id: int, db: Session = Depends(get_read_db)):
     menu_category = crud.read_menu_category(db, category_id)
     if menu_category is None:
         raise HTTPException(404, f"MenuCategory {category_id} not found")
@@ -37,10 +39,10 @@ def get_menu_category(category_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/categories", response_model=LimitOffsetPage[schemas.MenuCategory])
-def get_menu_categories(db: Session = Depends(get_db)):
+def get_menu_categories(db: Session = Depends(get_read_db)):
     # TODO order by
-    query = crud.read_menu_categories(db)
-    return paginate(query)
+    query = crud.read_menu_categories()
+    return paginate(db, query)
 
 
 @router.post("", response_model=schemas.MenuItem, status_code=201)
@@ -50,16 +52,30 @@ def create_menu_item(menu_item: schemas.MenuItemCreate, db: Session = Depends(ge
     return crud.create_menu_item(db, menu_item)
 
 
-@router.get("", response_model=LimitOffsetPage[schemas.MenuItem])
+@router.get("", response_model=pagination.KeysetPage[schemas.MenuItem])
 def get_menu(
     category_id: int | None = None,
     name: str | None = None,
     descending: str | None = None,
-    db: Session = Depends(get_db),
+    ids: list[int] | None = Depends(pagination.ids_param),
+    db: Session = Depends(get_read_db),
 ):
-    # TODO order by
-    query = crud.read_menu_items(db, category_id, name, descending is not None)
-    return paginate(query)
+    query = crud.read_menu_items(category_id, name, descending is not None)
+    if ids is None:
+        page = pagination.paginate(db, query)
+    else:
+        page = pagination.paginate_ids(db, query, ids)
+    return serialization.trusted_response(pagination.KeysetPage[schemas.MenuItem], page)
+
+
+@router.get("/autocomplete", response_model=list[schemas.MenuItemSuggestion])
+def autocomplete_menu_items(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db),
+):
+    # served from the in-memory index, which only holds rows read from the database
+    return ORJSONResponse(typeahead.menu_index.search(db, q, limit))
 
 
 @router.patch("/{menu_item_id}", response_model=schemas.MenuItem)
@@ -72,8 +88,12 @@ def update_menu_item(
 
 
 @router.get("/{menu_item_id}", response_model=schemas.MenuItem)
-def get_menu_item(menu_item_id: int, db: Session = Depends(get_db)):
-    menu_item = crud.read_menu_item(db, menu_item_id)
-    if menu_item is None:
+def get_menu_item(
+    menu_item_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)
+):
+    version = crud.read_menu_item_version(db, menu_item_id)
+    if version is None:
         raise HTTPException(404, f"MenuItem {menu_item_id} does not exist")
-    return menu_item
+    if not_modified := etag.not_modified(request, response, version):
+        return not_modified
+    return crud.read_menu_item(db, menu_item_id)
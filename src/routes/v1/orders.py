@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-from fastapi_pagination import LimitOffsetPage
-from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlalchemy.orm import Session
 
-from src import crud, schemas
-from src.dependencies import get_db
+from src import crud, etag, export, schemas, serialization
+from src.dependencies import get_db, get_read_db
+from src.pagination import KeysetPage, ids_param, paginate, paginate_ids
 
 router = APIRouter(
     prefix="/orders",
@@ -40,19 +41,59 @@ def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
     return crud.create_order(db, order)
 
 
+@router.post("/bulk", response_model=schemas.OrderBulkCreateResponse)
+def create_orders(
+    orders: list[schemas.OrderCreate] = Body(..., max_items=1000),
+    db: Session = Depends(get_db),
+):
+    results = crud.create_orders(db, orders)
+    created = sum(result.id is not None for result in results)
+    return schemas.OrderBulkCreateResponse(
+        created=created, failed=len(results) - created, results=results
+    )
+
+
+@router.patch("/bulk", response_model=schemas.OrderBulkEditResponse)
+def update_orders(orders: schemas.OrderBulkEdit, db: Session = Depends(get_db)):
+    return schemas.OrderBulkEditResponse(updated=crud.update_orders(db, orders))
+
+
+@router.get("/export")
+def export_orders(
+    inclusive_start_date: date | None = None,
+    exclusive_end_date: date | None = None,
+    format: schemas.ExportFormat = schemas.ExportFormat.CSV,
+    db: Session = Depends(get_read_db),
+):
+    query = crud.export_orders(inclusive_start_date, exclusive_end_date)
+    return export.stream(db, query, format, "orders")
+
+
 @router.get("/{order_id}", response_model=schemas.Order)
-def get_order(order_id: int, db: Session = Depends(get_db)):
-    order_item = crud.read_order(db, order_id)
-    if order_item is None:
+def get_order(
+    order_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)
+):
+    version = crud.read_order_version(db, order_id)
+    if version is None:
         raise HTTPException(404, f"Order {order_id} does not exist")
+    if not_modified := etag.not_modified(request, response, version):
+        return not_modified
     return crud.read_order(db, order_id)
 
 
-@router.get("", response_model=LimitOffsetPage[schemas.Order])
-def get_orders(completed: bool, db: Session = Depends(get_db)):
-    # TODO order by
-    query = crud.read_orders(db, completed)
-    return paginate(query)
+@router.get("", response_model=KeysetPage[schemas.Order])
+def get_orders(
+    completed: bool | None = Query(None, description="Required, unless ids are given"),
+    unpaid: bool
+    | None = Query(None, description="true: orders with a balance due, false: paid up orders"),
+    ids: list[int] | None = Depends(ids_param),
+    db: Session = Depends(get_read_db),
+):
+    if ids is None and completed is None:
+        raise HTTPException(400, "completed is required, unless ids are given")
+    query = crud.read_orders(completed, unpaid)
+    page = paginate(db, query) if ids is None else paginate_ids(db, query, ids)
+    return serialization.trusted_response(KeysetPage[schemas.Order], page)
 
 
 @router.patch("/{order_id}", response_model=schemas.Order)
@@ -1,12 +1,11 @@
 from datetime import date, datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi_pagination import LimitOffsetPage
-from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlalchemy.orm import Session
 
-from src import crud, schemas
-from src.dependencies import get_db
+from src import crud, export, schemas, serialization
+from src.dependencies import get_db, get_read_db
+from src.pagination import KeysetPage, paginate
 
 router = APIRouter(
     prefix="/payments",
@@ -36,19 +35,31 @@ def update_payment(payment_id: int, payment: schemas.PaymentEdit, db: Session =
     return crud.update_payment(db, payment_id, payment)
 
 
-@router.get("", response_model=LimitOffsetPage[schemas.Payment])
+@router.get("", response_model=KeysetPage[schemas.Payment])
 def get_payments(
     inclusive_start_date: str | None = Query(None, regex=r"^\d{4}-\d{2}-\d{2}$"),
     exclusive_end_date: str | None = Query(None, regex=r"^\d{4}-\d{2}-\d{2}$"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    # TODO order by
     query = crud.read_payments(
-        db,
         _parse_date(inclusive_start_date),
         _parse_date(exclusive_end_date),
     )
-    return paginate(query)
+    return serialization.trusted_response(KeysetPage[schemas.Payment], paginate(db, query))
+
+
+@router.get("/export")
+def export_payments(
+    inclusive_start_date: str | None = Query(None, regex=r"^\d{4}-\d{2}-\d{2}$"),
+    exclusive_end_date: str | None = Query(None, regex=r"^\d{4}-\d{2}-\d{2}$"),
+    format: schemas.ExportFormat = schemas.ExportFormat.CSV,
+    db: Session = Depends(get_read_db),
+):
+    query = crud.export_payments(
+        _parse_date(inclusive_start_date),
+        _parse_date(exclusive_end_date),
+    )
+    return export.stream(db, query, format, "payments")
 
 
 @router.delete("/{payment_id}", response_model=schemas.Order)
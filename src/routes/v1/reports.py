@@ -0,0 +1,51 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from src import cache, crud, models, schemas
+from src.dependencies import get_read_db
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["reports"],
+    route_class=cache.cached_route(models.PaymentRollup, models.OrderItemRollup),
+)
+
+# Reports read the rollup tables maintained by crud, never the raw payments and order items.
+
+
+@router.get("/revenue/daily", response_model=list[schemas.DailyRevenue])
+def get_daily_revenue(
+    inclusive_start_date: date | None = None,
+    exclusive_end_date: date | None = None,
+    db: Session = Depends(get_read_db),
+):
+    return crud.read_daily_revenue(db, inclusive_start_date, exclusive_end_date)
+
+
+@router.get("/revenue/payment-methods", response_model=list[schemas.PaymentMethodRevenue])
+def get_payment_method_revenue(
+    inclusive_start_date: date | None = None,
+    exclusive_end_date: date | None = None,
+    db: Session = Depends(get_read_db),
+):
+    return crud.read_payment_method_revenue(db, inclusive_start_date, exclusive_end_date)
+
+
+@router.get("/revenue/campaigns", response_model=list[schemas.CampaignRevenue])
+def get_campaign_revenue(
+    inclusive_start_date: date | None = None,
+    exclusive_end_date: date | None = None,
+    db: Session = Depends(get_read_db),
+):
+    return crud.read_campaign_revenue(db, inclusive_start_date, exclusive_end_date)
+
+
+@router.get("/revenue/menu-items", response_model=list[schemas.MenuItemRevenue])
+def get_menu_item_revenue(
+    inclusive_start_date: date | None = None,
+    exclusive_end_date: date | None = None,
+    db: Session = Depends(get_read_db),
+):
+    return crud.read_menu_item_revenue(db, inclusive_start_date, exclusive_end_date)
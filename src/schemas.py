@@ -6,7 +6,9 @@ from pydantic import (
     ConstrainedStr,
     EmailStr,
     Extra,
+    Field,
     PositiveFloat,
+    root_validator,
     validator,
 )
 
@@ -102,6 +104,15 @@ class MenuItem(MenuItemEdit):
         orm_mode = True
 
 
+class MenuItemSuggestion(BaseModel):
+    id: int
+    name: str
+    category_id: int
+    category: str
+    price: float
+    price_units: str | None
+
+
 class OrderItemCreateNewOrder(BaseModel):
     menu_item_id: int
     quantity: int
@@ -162,6 +173,11 @@ class PaymentMethods(str, enum.Enum):
     PAYPAL = "paypal"
 
 
+class ExportFormat(str, enum.Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
 class PaymentCreateNewOrder(BaseModel):
     amount: PositiveFloat
     method: PaymentMethods
@@ -214,6 +230,10 @@ class Order(OrderEdit):
     price_adjustment: float
     notes: str | None
     completed: bool
+    subtotal: float
+    total: float
+    amount_paid: float
+    balance_due: float
     customer: Customer
     campaign: Campaign | None
     order_items: list[OrderItem]
@@ -222,3 +242,113 @@ class Order(OrderEdit):
     class Config:
         extra = Extra.forbid
         orm_mode = True
+
+
+class OrderBulkResult(BaseModel):
+    index: int  # position of the order in the request
+    id: int | None
+    error: str | None
+
+
+class OrderBulkCreateResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[OrderBulkResult]
+
+
+class OrderPartialEdit(BaseModel):
+    """The fields of an OrderEdit to change, fields left out are unchanged"""
+
+    customer_id: int | None
+    campaign_id: int | None
+    date_ordered: date | None
+    date_delivered: date | None
+    price_adjustment: float | None
+    notes: str | None
+    completed: bool | None
+
+    @validator("customer_id", "price_adjustment", "completed", pre=True)
+    def not_null(cls, v, field):
+        if v is None:
+            raise ValueError(f"{field.name} can't be null")
+        return v
+
+    class Config:
+        extra = Extra.forbid
+
+
+class OrderBulkFilter(BaseModel):
+    completed: bool | None
+    unpaid: bool | None
+    customer_id: int | None
+    campaign_id: int | None
+    # of the day the order counts towards, as in the reports
+    inclusive_start_date: date | None
+    exclusive_end_date: date | None
+
+    class Config:
+        extra = Extra.forbid
+
+
+class OrderBulkEdit(BaseModel):
+    """The orders with these ids and matching the filter, at least one of which is required"""
+
+    ids: list[int] | None = Field(None, max_items=1000)
+    filter: OrderBulkFilter | None
+    edit: OrderPartialEdit
+
+    @root_validator(skip_on_failure=True)
+    def selects_orders(cls, values):
+        order_filter = values.get("filter")
+        if values.get("ids") is None and not (
+            order_filter and order_filter.dict(exclude_none=True)
+        ):
+            raise ValueError("ids or a filter of the orders to edit is required")
+        if not values["edit"].dict(exclude_unset=True):
+            raise ValueError("edit requires at least one field")
+        return values
+
+    class Config:
+        extra = Extra.forbid
+
+
+class OrderBulkEditResponse(BaseModel):
+    updated: int
+
+
+class DailyRevenue(BaseModel):
+    date: date
+    amount: float
+    payments: int
+
+    class Config:
+        orm_mode = True
+
+
+class PaymentMethodRevenue(BaseModel):
+    method: PaymentMethods
+    amount: float
+    payments: int
+
+    class Config:
+        orm_mode = True
+
+
+class CampaignRevenue(BaseModel):
+    campaign_id: int | None
+    quantity: float
+    revenue: float
+    order_items: int
+
+    class Config:
+        orm_mode = True
+
+
+class MenuItemRevenue(BaseModel):
+    menu_item_id: int
+    quantity: float
+    revenue: float
+    order_items: int
+
+    class Config:
+        orm_mode = True
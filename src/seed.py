@@ -0,0 +1,353 @@
+"""
+Synthetic data for capacity planning and benchmarks, see `./run.py db seed`.
+
+Generates a bakery's menu, seasonal campaigns, customers and orders with their items and payments,
+over a range of days. Busy days (weekends, December) and regular customers get more orders,
+popular menu items are ordered more often, and recent orders are still open or unpaid.
+
+Rows are built as plain dicts, with their ids assigned up front and their values already in the
+form SQLite stores them (dates and timestamps as text), and written with the driver's executemany
+in batches of `BATCH_SIZE` rows: no ORM objects, no bind processing, no RETURNING. Orders are
+committed every `ORDERS_PER_TRANSACTION` orders. Order totals are computed as the rows are
+generated, the rollups are rebuilt once at the end.
+"""
+import itertools
+import random
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src import crud, models
+
+BATCH_SIZE = 10_000
+ORDERS_PER_TRANSACTION = 100_000
+
+# per unit of scale, with 1.75 items per order and 0.9 payment per order about 38,000 rows
+CUSTOMERS = 1000
+ORDERS_PER_CUSTOMER = 10
+
+MENU = {
+    # category: (price units, items and their price)
+    "Cocoa Bombs": (
+        "each",
+        {"Chocolate": 5.0, "Peppermint": 5.5, "Salted caramel": 6.0, "White chocolate": 5.5},
+    ),
+    "Cookies": (
+        "dozen",
+        {"Chocolate chip": 18.0, "Oatmeal raisin": 16.0, "Snickerdoodle": 16.0, "Sugar": 15.0},
+    ),
+    "Cakes": (
+        "each",
+        {"Carrot": 38.0, "Red velvet": 42.0, "Lemon": 36.0, "Cheesecake": 45.0},
+    ),
+    "Breads": (
+        "each",
+        {"Sourdough": 9.0, "Rye": 8.5, "Brioche": 10.0, "Focaccia": 8.0, "Baguette": 4.5},
+    ),
+    "Pastries": (
+        "dozen",
+        {"Croissant": 30.0, "Danish": 32.0, "Cinnamon roll": 28.0, "Scone": 24.0},
+    ),
+}
+
+# name, first day, last day (month, day), repeated every year
+CAMPAIGNS = [
+    ("Valentine's", (2, 1), (2, 14)),
+    ("Easter", (3, 20), (4, 10)),
+    ("Back to school", (8, 15), (9, 5)),
+    ("Holidays", (12, 1), (12, 24)),
+]
+
+FIRST_NAMES = ["Ana", "Ben", "Chloe", "David", "Emma", "Felix", "Grace", "Hugo", "Iris", "Jack"]
+LAST_NAMES = ["Garcia", "Smith", "Nguyen", "Martin", "Brown", "Lee", "Wilson", "Lopez", "Kim"]
+CUSTOMER_NOTES = ["Allergic to nuts", "Prefers pickup", "Wholesale, invoice monthly"]
+ORDER_NOTES = ["Gift wrap", "Happy birthday on the cake", "Deliver after 5pm", "No nuts"]
+# value: weight
+PAYMENT_METHODS = {"cash": 40, "zelle": 35, "paypal": 25}
+ITEMS_PER_ORDER = {1: 45, 2: 30, 3: 15, 4: 7, 5: 3}
+QUANTITIES_EACH = {1: 30, 2: 25, 3: 10, 4: 10, 6: 15, 12: 10}
+QUANTITIES_DOZEN = {1: 60, 2: 30, 3: 10}
+
+# orders older than this are mostly completed and paid
+OPEN_ORDER_DAYS = 14
+
+
+def seed(
+    db: Session,
+    scale: float = 1.0,
+    days: int = 365,
+    rng: random.Random | None = None,
+    end: date | None = None,
+) -> dict[str, int]:
+    """
+    Seed an empty database with `scale` units of data (see CUSTOMERS), ordered over the `days`
+    days before `end` (today by default). Returns the number of rows inserted per table.
+    """
+    rng = rng or random.Random()
+    end = end or date.today()
+    start = end - timedelta(days=days)
+    for model in (models.Customer, models.MenuCategory, models.Campaign, models.Order):
+        if db.scalar(select(model.id).limit(1)) is not None:
+            raise ValueError(f"The {model.__tablename__} table is not empty")
+
+    counts: Counter[str] = Counter()
+
+    def insert_rows(model: type[models.Base], rows: list[dict[str, Any]]):
+        counts[model.__tablename__] += len(rows)
+        if not rows:
+            return
+        columns = list(rows[0])
+        statement = (
+            f"INSERT INTO {model.__tablename__} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        for offset in range(0, len(rows), BATCH_SIZE):
+            batch = [tuple(row.values()) for row in rows[offset : offset + BATCH_SIZE]]
+            db.connection().exec_driver_sql(statement, batch)
+
+    now = _timestamp(models.utcnow())
+    categories, menu_items = _menu(now)
+    insert_rows(models.MenuCategory, categories)
+    insert_rows(models.MenuItem, menu_items)
+    campaigns = _campaigns(start, end, now)
+    insert_rows(models.Campaign, campaigns)
+    customers = _customers(max(1, round(CUSTOMERS * scale)), start, rng)
+    insert_rows(models.Customer, customers)
+    db.commit()
+
+    generator = _OrderGenerator(rng, start, end, customers, menu_items, campaigns)
+    order_count = max(1, round(len(customers) * ORDERS_PER_CUSTOMER))
+    for offset in range(0, order_count, ORDERS_PER_TRANSACTION):
+        orders, order_items, payments = generator.orders(
+            min(ORDERS_PER_TRANSACTION, order_count - offset)
+        )
+        insert_rows(models.Order, orders)
+        insert_rows(models.OrderItem, order_items)
+        insert_rows(models.Payment, payments)
+        db.commit()
+
+    crud.rebuild_rollups(db)
+    return dict(counts)
+
+
+def _timestamp(value: datetime) -> str:
+    """As stored by the DateTimeUTC columns"""
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _at(day: date, seconds: int = 0) -> str:
+    return _timestamp(datetime.combine(day, time()) + timedelta(seconds=seconds))
+
+
+def _menu(now: str) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    timestamps = {"date_created": now, "date_modified": now}
+    categories, menu_items = [], []
+    for category_id, (category, (units, prices)) in enumerate(MENU.items(), start=1):
+        categories.append({"id": category_id, "name": category, "description": None, **timestamps})
+        for name, price in prices.items():
+            menu_items.append(
+                {
+                    "id": len(menu_items) + 1,
+                    "name": f"{name} {category.lower()}",
+                    "category_id": category_id,
+                    "description": None,
+                    "price": price,
+                    "price_units": units,
+                    **timestamps,
+                }
+            )
+    return categories, menu_items
+
+
+def _campaigns(start: date, end: date, now: str) -> list[dict[str, Any]]:
+    campaigns = []
+    for year in range(start.year, end.year + 1):
+        for name, (start_month, start_day), (end_month, end_day) in CAMPAIGNS:
+            date_start = date(year, start_month, start_day)
+            date_end = date(year, end_month, end_day)
+            if date_end < start or date_start > end:
+                continue
+            campaigns.append(
+                {
+                    "id": len(campaigns) + 1,
+                    "name": f"{name} {year}",
+                    "description": f"{name} menu",
+                    "date_start": date_start.isoformat(),
+                    "date_end": date_end.isoformat(),
+                    "date_created": now,
+                    "date_modified": now,
+                }
+            )
+    return campaigns
+
+
+def _customers(count: int, start: date, rng: random.Random) -> list[dict[str, Any]]:
+    customers = []
+    for customer_id in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        created = _at(start, rng.randrange(86400))
+        customers.append(
+            {
+                "id": customer_id,
+                "name": f"{first} {last}".lower(),  # normalized, see schemas.CustomerCreate
+                # unique, derived from the id
+                "email": f"{first}.{last}{customer_id}@example.com".lower()
+                if rng.random() < 0.4
+                else None,
+                "phone": f"(555) {customer_id // 10000:03}-{customer_id % 10000:04}"
+                if rng.random() < 0.7
+                else None,
+                "notes": rng.choice(CUSTOMER_NOTES) if rng.random() < 0.05 else None,
+                "date_created": created,
+                "date_modified": created,
+            }
+        )
+    return customers
+
+
+class _OrderGenerator:
+    """Orders in chronological order, ids continuing from one call to the next"""
+
+    def __init__(
+        self,
+        rng: random.Random,
+        start: date,
+        end: date,
+        customers: list[dict[str, Any]],
+        menu_items: list[dict[str, Any]],
+        campaigns: list[dict[str, Any]],
+    ):
+        self.rng = rng
+        self.end = end
+        self.days = [start + timedelta(days=n) for n in range((end - start).days)]
+        self.day_weights = list(itertools.accumulate(_day_weight(day) for day in self.days))
+        self.customer_ids = [customer["id"] for customer in customers]
+        # regulars: the n-th customer orders about as often as 1 / n ** 0.7
+        self.customer_weights = list(
+            itertools.accumulate(1 / n**0.7 for n in range(1, len(customers) + 1))
+        )
+        self.menu_items = rng.sample(menu_items, len(menu_items))
+        self.menu_item_weights = list(
+            itertools.accumulate(1 / n**0.5 for n in range(1, len(menu_items) + 1))
+        )
+        self.campaign_by_day = {}
+        for campaign in campaigns:
+            day = date.fromisoformat(campaign["date_start"])
+            while day <= date.fromisoformat(campaign["date_end"]):
+                self.campaign_by_day[day] = campaign["id"]
+                day += timedelta(days=1)
+        self.order_id = self.order_item_id = self.payment_id = 0  # the last ids generated
+
+    def orders(self, count: int) -> tuple[list[dict], list[dict], list[dict]]:
+        # the hot loop: random() and list lookups, rather than the slower choice() and choices()
+        rng, random = self.rng, self.rng.random
+        days = rng.choices(self.days, cum_weights=self.day_weights, k=count)
+        # the second of the day, open 7am to 7pm: ids follow the orders' creation
+        moments = sorted(zip(days, (7 * 3600 + int(random() * 12 * 3600) for _ in days)))
+        customer_ids = rng.choices(self.customer_ids, cum_weights=self.customer_weights, k=count)
+        items_per_order = _weighted(ITEMS_PER_ORDER)
+        quantities = {"each": _weighted(QUANTITIES_EACH), "dozen": _weighted(QUANTITIES_DOZEN)}
+        methods = _weighted(PAYMENT_METHODS)
+        orders: list[dict[str, Any]] = []
+        order_items: list[dict[str, Any]] = []
+        payments: list[dict[str, Any]] = []
+        for (day, second), customer_id in zip(moments, customer_ids):
+            self.order_id += 1
+            day_text = day.isoformat()
+            minutes, seconds = divmod(second, 60)
+            created = f"{day_text} {minutes // 60:02}:{minutes % 60:02}:{seconds:02}.000000"
+
+            item_count = items_per_order[int(random() * len(items_per_order))]
+            picked = rng.choices(self.menu_items, cum_weights=self.menu_item_weights, k=item_count)
+            subtotal = 0.0
+            for menu_item in {menu_item["id"]: menu_item for menu_item in picked}.values():
+                choices = quantities[menu_item["price_units"]]
+                quantity = choices[int(random() * len(choices))]
+                price = menu_item["price"]
+                charged_price = round(price * 0.9, 2) if random() < 0.05 else price
+                subtotal += quantity * charged_price
+                self.order_item_id += 1
+                order_items.append(
+                    {
+                        "id": self.order_item_id,
+                        "menu_item_id": menu_item["id"],
+                        "order_id": self.order_id,
+                        "quantity": quantity,
+                        "menu_price": price,
+                        "charged_price": charged_price,
+                        "notes": None,
+                        "date_created": created,
+                        "date_modified": created,
+                    }
+                )
+            subtotal = round(subtotal, 2)
+
+            price_adjustment = 0.0
+            if random() < 0.1:
+                price_adjustment = -round(subtotal * (0.05 + random() * 0.15), 2)  # a discount
+            elif random() < 0.05:
+                price_adjustment = 5.0  # a delivery fee
+            total = round(subtotal + price_adjustment, 2)
+
+            recent = (self.end - day).days < OPEN_ORDER_DAYS
+            completed = random() < (0.3 if recent else 0.99)
+            amount_paid = 0.0
+            if random() < (0.4 if recent else 0.97):
+                # paid in full, or a deposit and the balance on delivery
+                amounts = [total]
+                if random() < 0.1:
+                    deposit = round(total / 2, 2)
+                    amounts = [deposit, round(total - deposit, 2)] if completed else [deposit]
+                for n, amount in enumerate(amounts):
+                    payment_day = day_text
+                    if n:
+                        payment_day = min(day + timedelta(days=1 + int(random() * 3)), self.end)
+                        payment_day = payment_day.isoformat()
+                    self.payment_id += 1
+                    payments.append(
+                        {
+                            "id": self.payment_id,
+                            "order_id": self.order_id,
+                            "amount": amount,
+                            "method": methods[int(random() * len(methods))],
+                            "date": payment_day,
+                            "date_created": created,
+                            "date_modified": created,
+                        }
+                    )
+                amount_paid = round(sum(amounts), 2)
+
+            date_delivered = None
+            if completed:
+                date_delivered = min(day + timedelta(days=int(random() * 4)), self.end).isoformat()
+            orders.append(
+                {
+                    "id": self.order_id,
+                    "customer_id": customer_id,
+                    "campaign_id": self.campaign_by_day.get(day) if random() < 0.7 else None,
+                    "date_ordered": day_text,
+                    "date_delivered": date_delivered,
+                    "price_adjustment": price_adjustment,
+                    "notes": rng.choice(ORDER_NOTES) if random() < 0.05 else None,
+                    "completed": completed,
+                    "subtotal": subtotal,
+                    "total": total,
+                    "amount_paid": amount_paid,
+                    "date_created": created,
+                    "date_modified": created,
+                }
+            )
+        return orders, order_items, payments
+
+
+def _weighted(weights: dict[Any, int]) -> list[Any]:
+    """A list in which each value appears its weight times, to pick from with random()"""
+    return [value for value, weight in weights.items() for _ in range(weight)]
+
+
+def _day_weight(day: date) -> float:
+    weight = 1.5 if day.weekday() >= 5 else 1.0
+    return weight * 2 if day.month == 12 else weight
@@ -2,12 +2,63 @@ import os
 
 COOKIE_SECRET = os.environ["COOKIE_SECRET"]
 COOKIE_MAX_AGE_MINUTES = int(os.environ["COOKIE_MAX_AGE_MINUTES"])
+# number of verified session tokens kept in memory, see auth.SessionCache. 0 disables the cache
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", 1024))
+# seconds a cached session is trusted without looking the user up again
+SESSION_CACHE_TTL_SECONDS = int(os.environ.get("SESSION_CACHE_TTL_SECONDS", 60))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 512))  # 0 disables the cache
+# keep the menu typeahead index in memory, see typeahead.py. false: every autocomplete request reads
+# the menu from the database
+TYPEAHEAD_INDEX = os.environ.get("TYPEAHEAD_INDEX", "true") == "true"
+# build the menu typeahead index at startup rather than on the first autocomplete request
+TYPEAHEAD_BUILD_ON_STARTUP = os.environ.get("TYPEAHEAD_BUILD_ON_STARTUP", "true") == "true"
+
+# Password hashing policy: the first scheme hashes new passwords, the others are only verified.
+# Stored hashes not matching the policy are re-hashed on the user's next successful login.
+PASSWORD_SCHEMES = os.environ.get("PASSWORD_SCHEMES", "bcrypt").split(",")
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+# Password verification runs in a process pool of this size, and logins beyond
+# PASSWORD_HASH_MAX_PENDING concurrent verifications are turned away with a 503
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 16))
 
 PORT = 8000
 
 ENV = "dev"
 
 SQLALCHEMY_DATABASE_URL = os.environ["SQLALCHEMY_DATABASE_URL"]
+# GET routes read from this database, see dependencies.get_read_db. It defaults to a read-only
+# pool on the primary, which under WAL doesn't block (nor wait on) writers.
+SQLALCHEMY_READ_DATABASE_URL = os.environ.get(
+    "SQLALCHEMY_READ_DATABASE_URL", SQLALCHEMY_DATABASE_URL
+)
+# with a replica, clients read from the primary for this long after a write to see their writes
+READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS", 10))
+
+# Connection pool, ignored by in-memory SQLite databases
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))  # seconds waiting for a connection
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", -1))  # seconds, -1 never recycles
+# test connections on checkout, for servers dropping idle connections
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "false") == "true"
+
+# SQLite PRAGMAs applied to every new connection, see database._SQLITE_PRAGMAS.
+# An empty value leaves SQLite's default.
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")  # durable enough with WAL
+SQLITE_BUSY_TIMEOUT_MS = os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")
+SQLITE_MMAP_SIZE = os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))  # bytes
+SQLITE_CACHE_SIZE = os.environ.get("SQLITE_CACHE_SIZE", "-65536")  # negative: KiB, i.e. 64 MiB
+# prepared statements kept per connection by the sqlite3 module
+SQLITE_STATEMENT_CACHE_SIZE = int(os.environ.get("SQLITE_STATEMENT_CACHE_SIZE", 256))
+
+# Statements slower than this are logged with their query plan, see slow_queries.py.
+# A negative threshold disables the log.
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 100))
+# at most this many slow queries are logged per SLOW_QUERY_LOG_INTERVAL_SECONDS
+SLOW_QUERY_LOG_LIMIT = int(os.environ.get("SLOW_QUERY_LOG_LIMIT", 10))
+SLOW_QUERY_LOG_INTERVAL_SECONDS = float(os.environ.get("SLOW_QUERY_LOG_INTERVAL_SECONDS", 60))
 
 
 def dump():
@@ -15,4 +66,28 @@ def dump():
         "ENV": ENV,
         "PORT": PORT,
         "COOKIE_MAX_AGE_MINUTES": COOKIE_MAX_AGE_MINUTES,
+        "SESSION_CACHE_SIZE": SESSION_CACHE_SIZE,
+        "SESSION_CACHE_TTL_SECONDS": SESSION_CACHE_TTL_SECONDS,
+        "RESPONSE_CACHE_SIZE": RESPONSE_CACHE_SIZE,
+        "TYPEAHEAD_INDEX": TYPEAHEAD_INDEX,
+        "TYPEAHEAD_BUILD_ON_STARTUP": TYPEAHEAD_BUILD_ON_STARTUP,
+        "PASSWORD_SCHEMES": PASSWORD_SCHEMES,
+        "BCRYPT_ROUNDS": BCRYPT_ROUNDS,
+        "PASSWORD_HASH_WORKERS": PASSWORD_HASH_WORKERS,
+        "PASSWORD_HASH_MAX_PENDING": PASSWORD_HASH_MAX_PENDING,
+        "DB_POOL_SIZE": DB_POOL_SIZE,
+        "DB_MAX_OVERFLOW": DB_MAX_OVERFLOW,
+        "DB_POOL_TIMEOUT": DB_POOL_TIMEOUT,
+        "DB_POOL_RECYCLE": DB_POOL_RECYCLE,
+        "DB_POOL_PRE_PING": DB_POOL_PRE_PING,
+        "SQLITE_JOURNAL_MODE": SQLITE_JOURNAL_MODE,
+        "SQLITE_SYNCHRONOUS": SQLITE_SYNCHRONOUS,
+        "SQLITE_BUSY_TIMEOUT_MS": SQLITE_BUSY_TIMEOUT_MS,
+        "SQLITE_MMAP_SIZE": SQLITE_MMAP_SIZE,
+        "SQLITE_CACHE_SIZE": SQLITE_CACHE_SIZE,
+        "SQLITE_STATEMENT_CACHE_SIZE": SQLITE_STATEMENT_CACHE_SIZE,
+        "READ_YOUR_WRITES_SECONDS": READ_YOUR_WRITES_SECONDS,
+        "SLOW_QUERY_THRESHOLD_MS": SLOW_QUERY_THRESHOLD_MS,
+        "SLOW_QUERY_LOG_LIMIT": SLOW_QUERY_LOG_LIMIT,
+        "SLOW_QUERY_LOG_INTERVAL_SECONDS": SLOW_QUERY_LOG_INTERVAL_SECONDS,
     }
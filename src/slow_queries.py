@@ -0,0 +1,112 @@
+"""
+Slow-query log.
+
+Statements taking longer than settings.SLOW_QUERY_THRESHOLD_MS are logged as a warning with their
+parameters, the route that ran them and, on SQLite, their `EXPLAIN QUERY PLAN`: enough to tell
+which of a page's queries is slow and whether it scans a table instead of using an index.
+
+At most settings.SLOW_QUERY_LOG_LIMIT statements are logged per interval, the others are counted
+and the count is reported with the next logged statement. The plan is only computed for logged
+statements, so a burst of slow queries doesn't run a burst of EXPLAINs.
+"""
+import logging
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from src import database, metrics, settings
+
+logger = logging.getLogger("bakery.slow_queries")
+
+MAX_PARAMETERS_LENGTH = 1000
+
+
+class RateLimiter:
+    """Allows `limit` events per `interval` seconds, in fixed windows"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._window_start = float("-inf")
+        self._allowed = 0
+        self._suppressed = 0
+
+    def allow(self) -> tuple[bool, int]:
+        """Whether an event is allowed, and how many were suppressed since the last allowed one"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._window_start >= settings.SLOW_QUERY_LOG_INTERVAL_SECONDS:
+                self._window_start, self._allowed = now, 0
+            if self._allowed >= settings.SLOW_QUERY_LOG_LIMIT:
+                self._suppressed += 1
+                return False, 0
+            self._allowed += 1
+            suppressed, self._suppressed = self._suppressed, 0
+            return True, suppressed
+
+    def reset(self):
+        with self._lock:
+            self._window_start, self._allowed, self._suppressed = float("-inf"), 0, 0
+
+
+rate_limiter = RateLimiter()
+
+
+def _query_plan(conn: Connection, statement: str, parameters: Any) -> str | None:
+    if conn.dialect.name != "sqlite":
+        return None
+    # on a cursor of its own, so that the EXPLAIN doesn't go through the engine events again
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        rows = cursor.fetchall()
+    except Exception as exc:
+        return f"unavailable: {exc}"
+    finally:
+        cursor.close()
+    # (id, parent, notused, detail): indent each step under its parent
+    depths = {0: -1}
+    lines = []
+    for step_id, parent, _, detail in rows:
+        depths[step_id] = depths.get(parent, -1) + 1
+        lines.append("  " * depths[step_id] + detail)
+    return "\n".join(lines)
+
+
+def _truncate(value: Any) -> str:
+    text = repr(value)
+    if len(text) > MAX_PARAMETERS_LENGTH:
+        return text[:MAX_PARAMETERS_LENGTH] + "..."
+    return text
+
+
+def _instrument(engine: Engine):
+    # statements are timed by the metrics' engine events
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = metrics.statement_elapsed(context)
+        if elapsed is None or settings.SLOW_QUERY_THRESHOLD_MS < 0:
+            return
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+            return
+        allowed, suppressed = rate_limiter.allow()
+        if not allowed:
+            return
+        # executemany: the first row's parameters stand for the others
+        plan_parameters = parameters[0] if executemany and parameters else parameters
+        logger.warning(
+            "Slow query (%.1f ms) in %s%s\n%s\nparameters: %s\nquery plan:\n%s",
+            elapsed_ms,
+            metrics.current_route() or "no request",
+            f", {suppressed} more slow queries not logged" if suppressed else "",
+            statement,
+            _truncate(parameters),
+            _query_plan(conn, statement, plan_parameters),
+        )
+
+
+for _engine in database.engines.values():
+    _instrument(_engine)
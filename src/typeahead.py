@@ -0,0 +1,140 @@
+"""
+In-memory typeahead index of the menu, for GET /menu/autocomplete.
+
+Every word of a menu item's name and of its category's name is a key in a sorted array. A prefix
+lookup is a binary search (bisect) for the first key >= prefix followed by a scan while keys
+start with it, so a keystroke costs microseconds and no database round trip.
+
+The index is built from the database on first use (or at startup, see main.startup) and kept up
+to date by the crud functions writing menu items and categories, after they commit. Writes made by
+other workers bump the menu tables' generations (see cache.py), and the index is rebuilt.
+Where workers don't share the generations the index is disabled (settings.TYPEAHEAD_INDEX) and
+every search reads the menu from the database instead.
+"""
+import bisect
+import re
+import threading
+from typing import Any
+
+from sqlalchemy.orm import Session, joinedload
+
+from src import cache, models, settings
+
+_TABLES = (models.MenuItem.__tablename__, models.MenuCategory.__tablename__)
+
+
+def _words(text: str | None) -> list[str]:
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def _suggestion(menu_item: models.MenuItem, categories: dict[int, str]) -> dict[str, Any]:
+    return {
+        "id": menu_item.id,
+        "name": menu_item.name,
+        "category_id": menu_item.category_id,
+        "category": categories.get(menu_item.category_id),
+        "price": menu_item.price,
+        "price_units": menu_item.price_units,
+    }
+
+
+def _index(suggestions: dict[int, dict[str, Any]]) -> list[tuple[str, int]]:
+    keys = set()
+    for suggestion in suggestions.values():
+        for word in _words(suggestion["name"]) + _words(suggestion["category"]):
+            keys.add((word, suggestion["id"]))
+    return sorted(keys)
+
+
+def _read_menu(db: Session) -> tuple[dict[int, str], dict[int, dict[str, Any]]]:
+    """The categories' names and the suggestions, by id"""
+    menu_items = db.query(models.MenuItem).options(joinedload(models.MenuItem.category)).all()
+    categories = {item.category.id: item.category.name for item in menu_items}
+    return categories, {item.id: _suggestion(item, categories) for item in menu_items}
+
+
+class MenuIndex:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._built = False
+        self._generations: tuple[int, ...] = ()  # of _TABLES, when the index was last updated
+        self._suggestions: dict[int, dict[str, Any]] = {}  # by menu item id, see schemas
+        self._categories: dict[int, str] = {}
+        # sorted (word, menu item id) pairs, replaced as a whole on every write
+        self._keys: list[tuple[str, int]] = []
+
+    def build(self, db: Session):
+        if not self.enabled:
+            return
+        generations = cache.generations(_TABLES)
+        categories, suggestions = _read_menu(db)
+        with self._lock:
+            self._categories, self._suggestions = categories, suggestions
+            self._keys = _index(suggestions)
+            self._generations = generations
+            self._built = True
+
+    def clear(self):
+        with self._lock:
+            self._built = False
+            self._suggestions, self._categories, self._keys = {}, {}, []
+
+    def _record_own_write(self, table: str):
+        # the commit bumped `table` once, any other change is another worker's write, which the
+        # next search rebuilds the index for
+        expected = tuple(g + (t == table) for g, t in zip(self._generations, _TABLES))
+        if cache.generations(_TABLES) == expected:
+            self._generations = expected
+
+    def update_menu_item(self, menu_item: models.MenuItem):
+        with self._lock:
+            if not self._built:
+                return
+            self._categories[menu_item.category.id] = menu_item.category.name
+            self._suggestions[menu_item.id] = _suggestion(menu_item, self._categories)
+            self._keys = _index(self._suggestions)
+            self._record_own_write(models.MenuItem.__tablename__)
+
+    def update_category(self, category: models.MenuCategory):
+        with self._lock:
+            if not self._built:
+                return
+            self._categories[category.id] = category.name
+            for suggestion in self._suggestions.values():
+                if suggestion["category_id"] == category.id:
+                    suggestion["category"] = category.name
+            self._keys = _index(self._suggestions)
+            self._record_own_write(models.MenuCategory.__tablename__)
+
+    def _prefix_matches(self, keys: list[tuple[str, int]], prefix: str) -> set[int]:
+        ids = set()
+        for word, menu_item_id in keys[bisect.bisect_left(keys, (prefix,)) :]:
+            if not word.startswith(prefix):
+                break
+            ids.add(menu_item_id)
+        return ids
+
+    def search(self, db: Session, q: str, limit: int) -> list[dict[str, Any]]:
+        """
+        Menu items having a word starting with each word of `q`, in their name or category.
+        Items whose name starts with `q` come first, then by name.
+        """
+        if not self.enabled:
+            suggestions = _read_menu(db)[1]
+            keys = _index(suggestions)
+        else:
+            if not self._built or self._generations != cache.generations(_TABLES):
+                self.build(db)
+            keys, suggestions = self._keys, self._suggestions
+        words = _words(q)
+        if not words:
+            return []
+        ids = set.intersection(*(self._prefix_matches(keys, word) for word in words))
+        q = q.lower()
+        matches = [suggestions[i] for i in ids]
+        matches.sort(key=lambda s: (not s["name"].lower().startswith(q), s["name"].lower()))
+        return matches[:limit]
+
+
+menu_index = MenuIndex(settings.TYPEAHEAD_INDEX)
@@ -5,9 +5,9 @@ import pydantic
 import pytest
 from fastapi.testclient import TestClient
 
-from src import auth, crud, database, models, schemas
+from src import auth, cache, crud, database, models, schemas, typeahead
 from src.database import SessionLocal
-from src.dependencies import get_db
+from src.dependencies import get_db, get_read_db
 from src.main import app
 
 
@@ -33,6 +33,14 @@ def db(db_engine):
     connection.close()
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    auth.session_cache.clear()
+    cache.response_cache.clear()
+    typeahead.menu_index.clear()
+
+
 @pytest.fixture
 def user(db):
     db_user = models.User(name="cj", hashed_password=auth.pwd_context.hash("hunter123"))
@@ -44,6 +52,7 @@ def user(db):
 @pytest.fixture
 def client(db, user):
     app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_read_db] = lambda: db
     with TestClient(app) as client:
         client.post("/api/auth/login", json={"username": "cj", "password": "hunter123"})
         yield client
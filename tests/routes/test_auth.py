@@ -1,4 +1,8 @@
-from src import auth
+import threading
+
+from sqlalchemy import delete, event, update
+
+from src import auth, cache, database, models
 
 
 def test_login_logout(client):
@@ -20,3 +24,85 @@ def test_login_logout(client):
 
     response = client.post("/api/auth/login", json={"username": "cj", "password": "wrong-password"})
     assert response.status_code == 400
+
+
+def test_session_cache(client, db, user):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for _ in range(3):
+            response = client.get("/api/v1/users/me")
+            assert response.status_code == 200
+            assert response.json() == {"id": user.id, "name": "cj"}
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+    # the first request after login looks the user up, the others are served from the cache
+    assert len(statements) == 1
+
+    # updating the user drops its cached sessions
+    user.name = "cj2"
+    db.commit()
+    assert auth.session_cache.get(client.cookies["token"]) is None
+    assert client.get("/api/v1/users/me").status_code == 403
+
+    # as do bulk updates, and writes committed by other workers
+    user.name = "cj"
+    db.commit()
+    assert client.get("/api/v1/users/me").status_code == 200
+    db.execute(update(models.User).where(models.User.id == user.id).values(name="cj"))
+    db.commit()
+    assert auth.session_cache.get(client.cookies["token"]) is None
+    assert client.get("/api/v1/users/me").status_code == 200
+    cache.bump(models.User.__tablename__)
+    assert auth.session_cache.get(client.cookies["token"]) is None
+
+    # so does logging out
+    assert client.get("/api/v1/users/me").status_code == 200
+    token = client.cookies["token"]
+    client.get("/api/auth/logout")
+    assert auth.session_cache.get(token) is None
+
+
+def test_session_cache_ttl(client, db, user, monkeypatch):
+    token = client.cookies["token"]
+    assert client.get("/api/v1/users/me").status_code == 200
+    assert auth.session_cache.get(token) is not None
+
+    # users deleted behind the app's back are only seen once the entry expires
+    monkeypatch.setattr(auth.session_cache, "ttl", 0)
+    auth.session_cache.clear()
+    assert client.get("/api/v1/users/me").status_code == 200
+    assert auth.session_cache.get(token) is None
+    db.connection().execute(delete(models.User.__table__))
+    assert client.get("/api/v1/users/me").status_code == 403
+
+
+def test_session_cache_disabled(client, monkeypatch):
+    monkeypatch.setattr(auth.session_cache, "maxsize", 0)
+    assert client.get("/api/v1/users/me").status_code == 200
+    assert auth.session_cache.get(client.cookies["token"]) is None
+
+
+def test_login_rehashes_outdated_password_hash(client, db, user):
+    outdated_hash = auth.pwd_context.handler("bcrypt").using(rounds=5).hash("hunter123")
+    user.hashed_password = outdated_hash
+    db.commit()
+
+    response = client.post("/api/auth/login", json={"username": "cj", "password": "hunter123"})
+    assert response.status_code == 200
+    db.refresh(user)
+    assert user.hashed_password != outdated_hash
+    assert not auth.pwd_context.needs_update(user.hashed_password)
+    assert auth.verify_password("hunter123", user.hashed_password)
+
+
+def test_login_concurrency_cap(client, monkeypatch):
+    monkeypatch.setattr(auth, "_hash_slots", threading.BoundedSemaphore(1))
+    auth._hash_slots.acquire()  # a login is already being verified
+    response = client.post("/api/auth/login", json={"username": "cj", "password": "hunter123"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
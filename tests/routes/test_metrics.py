@@ -0,0 +1,59 @@
+import re
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+def scrape(client) -> dict[str, float]:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_metrics(client, customer):
+    route = 'method="GET",route="/api/v1/customers/{customer_id}"'
+    client.get("/api/v1/users/me")  # authenticate, later requests hit the session cache
+    before = scrape(client)
+    for _ in range(3):
+        assert client.get(f'/api/v1/customers/{customer["id"]}').status_code == 200
+    assert client.get("/api/v1/customers/999").status_code == 404
+    assert client.get("/nowhere/1").status_code == 404
+    after = scrape(client)
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    assert delta(f'bakery_http_requests_total{{{route},status="200"}}') == 3
+    assert delta(f'bakery_http_requests_total{{{route},status="404"}}') == 1
+    assert delta('bakery_http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert delta(f"bakery_http_request_duration_seconds_count{{{route}}}") == 4
+    assert delta(f'bakery_http_request_duration_seconds_bucket{{{route},le="+Inf"}}') == 4
+    assert delta(f"bakery_http_request_duration_seconds_sum{{{route}}}") > 0
+    # one statement for the version, one for the customer, one for the 404's version
+    assert delta(f"bakery_http_request_db_statements_sum{{{route}}}") == 7
+    assert delta(f"bakery_http_request_db_duration_seconds_sum{{{route}}}") > 0
+    assert delta('bakery_db_statements_total{engine="primary"}') >= 7
+
+    # every histogram's buckets are cumulative
+    buckets = [
+        value
+        for name, value in after.items()
+        if re.fullmatch(rf"bakery_http_request_db_statements_bucket\{{{route},le=.*\}}", name)
+    ]
+    assert buckets == sorted(buckets)
+
+
+def test_failed_statements(client, db):
+    before = scrape(client)
+    with pytest.raises(OperationalError):
+        db.execute(text("SELECT * FROM nowhere"))
+    after = scrape(client)
+    name = 'bakery_db_statements_total{engine="primary"}'
+    assert after[name] - before[name] == 1
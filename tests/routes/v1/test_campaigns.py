@@ -53,6 +53,28 @@ def test_campaigns(client):
     }
 
 
+def test_campaigns_by_ids(client):
+    campaigns = []
+    for name in ("Open Porch", "Holidays", "Easter"):
+        response = client.post("/api/v1/campaigns", json={"name": name, "description": name})
+        campaigns.append(response.json())
+
+    ids = [campaigns[1]["id"], 999, campaigns[0]["id"]]
+    response = client.get(f"/api/v1/campaigns?ids={','.join(map(str, ids))}")
+    assert response.status_code == 200
+    assert response.json() == {
+        "items": [campaigns[1], campaigns[0]],
+        "limit": 500,
+        "offset": 0,
+        "total": 2,
+    }
+
+    # every id is on the page, whatever the limit and offset
+    ids = [campaign["id"] for campaign in campaigns]
+    response = client.get(f"/api/v1/campaigns?limit=2&offset=1&ids={','.join(map(str, ids))}")
+    assert response.json() == {"items": campaigns, "limit": 500, "offset": 0, "total": 3}
+
+
 def test_create_campaign_unique_constraint(client, campaign):
     payload = {"name": campaign["name"], "description": "foo"}
     response = client.post("/api/v1/campaigns", json=payload)
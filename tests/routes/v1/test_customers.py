@@ -3,8 +3,10 @@ from datetime import datetime, timezone
 
 import freezegun
 import pytest
+from sqlalchemy import select
 
 from src import crud, models, schemas
+from src.pagination import encode_cursor
 
 
 def test_create_edit(client):
@@ -73,40 +75,46 @@ def test_get(client, customer_cj, customer_sarah, customer_sarah_2):
     response = client.get("/api/v1/customers")
     assert response.status_code == 200
     assert response.json() == {
-        "total": 3,
-        "limit": 50,
-        "offset": 0,
         "items": [customer_cj, customer_sarah, customer_sarah_2],
+        "next_page": None,
     }
 
-    # get page
-    response = client.get("/api/v1/customers?offset=1&limit=1")
-    assert response.status_code == 200
-    assert response.json() == {
-        "total": 3,
-        "limit": 1,
-        "offset": 1,
-        "items": [customer_sarah],
-    }
+    # get pages
+    pages, cursor = [], None
+    while True:
+        url = "/api/v1/customers?size=1" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append(page["items"])
+        cursor = page["next_page"]
+        if cursor is None:
+            break
+    assert pages == [[customer_cj], [customer_sarah], [customer_sarah_2]]
+
+    response = client.get("/api/v1/customers?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+    # every value must have its sort key's type
+    for values in (["cj", "1"], ["cj", 1.5], ["cj", True], [1, 1], [None, 1], ["cj"]):
+        response = client.get("/api/v1/customers", params={"cursor": encode_cursor(values)})
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid cursor"}
 
     # order by
     response = client.get("/api/v1/customers?orderBy=phone&descending=1")
     assert response.status_code == 200
     assert response.json() == {
-        "total": 3,
-        "limit": 50,
-        "offset": 0,
         "items": [customer_sarah, customer_cj, customer_sarah_2],
+        "next_page": None,
     }
 
     # get by name
     response = client.get("/api/v1/customers?name=sarah")
     assert response.status_code == 200
     assert response.json() == {
-        "total": 2,
-        "limit": 50,
-        "offset": 0,
         "items": [customer_sarah, customer_sarah_2],
+        "next_page": None,
     }
 
     # get by email
@@ -114,10 +122,8 @@ def test_get(client, customer_cj, customer_sarah, customer_sarah_2):
         response = client.get(f'/api/v1/customers?email={customer["email"]}')
         assert response.status_code == 200
         assert response.json() == {
-            "total": 1,
-            "limit": 50,
-            "offset": 0,
             "items": [customer],
+            "next_page": None,
         }
 
     # get by phone
@@ -125,10 +131,8 @@ def test_get(client, customer_cj, customer_sarah, customer_sarah_2):
         response = client.get(f'/api/v1/customers?phone={customer["phone"]}')
         assert response.status_code == 200
         assert response.json() == {
-            "total": 1,
-            "limit": 50,
-            "offset": 0,
             "items": [customer],
+            "next_page": None,
         }
 
     # get by name and phone and email
@@ -138,19 +142,113 @@ def test_get(client, customer_cj, customer_sarah, customer_sarah_2):
         )
         assert response.status_code == 200
         assert response.json() == {
-            "total": 1,
-            "limit": 50,
-            "offset": 0,
             "items": [customer],
+            "next_page": None,
         }
 
 
+def test_get_by_ids(client, customer_cj, customer_sarah, customer_sarah_2):
+    ids = [customer_sarah_2["id"], 999, customer_cj["id"], customer_sarah_2["id"]]
+    response = client.get(f"/api/v1/customers?ids={','.join(map(str, ids))}")
+    assert response.status_code == 200
+    assert response.json() == {"items": [customer_sarah_2, customer_cj], "next_page": None}
+
+    # combined with the filters
+    response = client.get(
+        f"/api/v1/customers?name=sarah&ids={customer_cj['id']},{customer_sarah['id']}"
+    )
+    assert response.json() == {"items": [customer_sarah], "next_page": None}
+
+    response = client.get("/api/v1/customers?ids=")
+    assert response.json() == {"items": [], "next_page": None}
+
+    response = client.get("/api/v1/customers?ids=1,two")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "ids must be comma separated integers"}
+
+    response = client.get(f"/api/v1/customers?ids={','.join(map(str, range(501)))}")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "At most 500 ids can be requested at once"}
+
+
+def test_get_conditional(client, customer_cj):
+    url = f'/api/v1/customers/{customer_cj["id"]}'
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert (response.status_code, response.content) == (304, b"")
+    assert response.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"other", ' + etag}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+    payload = {"name": customer_cj["name"], "notes": "likes cocoa bombs"}
+    assert client.patch(url, json=payload).status_code == 200
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["notes"] == "likes cocoa bombs"
+    assert response.headers["etag"] != etag
+
+
+def test_search(client, db, customer_cj, customer_sarah, customer_sarah_2):
+    def search(q, **params):
+        response = client.get("/api/v1/customers/search", params={"q": q, **params})
+        assert response.status_code == 200
+        return response.json()
+
+    def ids(page):
+        return [customer["id"] for customer in page["items"]]
+
+    maria = {"name": "maria lopez", "notes": "Orders the rye every week"}
+    maria = client.post("/api/v1/customers", json=maria).json()
+    friend = {"name": "bob", "notes": "maria's neighbour, likes rye"}
+    friend = client.post("/api/v1/customers", json=friend).json()
+
+    # any field, word prefixes, every word has to match
+    assert search("sarah") == {"items": [customer_sarah, customer_sarah_2], "next_page": None}
+    assert ids(search("sarah2@dom")) == [customer_sarah_2["id"]]
+    assert ids(search("714")) == [customer_sarah["id"]]
+    assert ids(search("867-5309")) == [
+        customer_cj["id"],
+        customer_sarah["id"],
+        customer_sarah_2["id"],
+    ]
+    assert ids(search("mari rye")) == [maria["id"], friend["id"]]  # name matches rank first
+    assert ids(search("maria lopez rye")) == [maria["id"]]
+    assert search("nobody") == {"items": [], "next_page": None}
+    # FTS5 query syntax is searched for literally
+    assert ids(search('maria" OR "bob')) == []
+    assert ids(search("(-*)")) == []
+
+    # pages
+    page = search("867", size=2)
+    assert len(page["items"]) == 2
+    assert ids(search("867", size=2, cursor=page["next_page"])) == [customer_sarah_2["id"]]
+
+    # the index follows updates and deletes
+    edit = {"name": "maria garcia", "notes": maria["notes"]}
+    assert client.patch(f'/api/v1/customers/{maria["id"]}', json=edit).status_code == 200
+    assert ids(search("lopez")) == []
+    assert ids(search("garcia")) == [maria["id"]]
+    # there is no route deleting customers
+    db.delete(db.get(models.Customer, maria["id"]))
+    db.commit()
+    assert ids(search("garcia")) == []
+    assert ids(search("rye")) == [friend["id"]]
+    fts = models.customers_fts
+    matches = select(fts.c.rowid).where(fts.c.customers_fts.op("MATCH")("rye"))
+    assert db.scalars(matches).all() == [friend["id"]]
+
+    assert client.get("/api/v1/customers/search?q=").status_code == 422
+
+
 def test_unauthorized(client):
     client.get("/api/auth/logout")
     assert client.post("/api/v1/customers").status_code == 403
     assert client.patch("/api/v1/customers/1").status_code == 403
     assert client.get("/api/v1/customers/1").status_code == 403
     assert client.get("/api/v1/customers").status_code == 403
+    assert client.get("/api/v1/customers/search?q=cj").status_code == 403
 
 
 def serialize_customer(customer: models.Customer):
@@ -1,6 +1,9 @@
 from datetime import datetime, timezone
 
 import freezegun
+from sqlalchemy import event, update
+
+from src import database, models, settings, typeahead
 
 
 def test_categories(client):
@@ -109,14 +112,187 @@ def test_menu_items(client, menu_category):
     assert response.json() == menu_item
 
     # get many
-    response = client.get("/api/v1/menu?offset=0&limit=10")
+    response = client.get("/api/v1/menu?size=10")
     assert response.status_code == 200
-    assert response.json() == {
-        "items": [menu_item],
-        "limit": 10,
-        "offset": 0,
-        "total": 1,
-    }
+    assert response.json() == {"items": [menu_item], "next_page": None}
+
+
+def test_menu_items_by_ids(client, menu_category):
+    menu_items = []
+    for name in ("Chocolate", "Peppermint", "Vanilla"):
+        payload = {"name": name, "category_id": menu_category["id"], "price": 5.0}
+        response = client.post("/api/v1/menu", json={**payload, "price_units": "each"})
+        menu_items.append(response.json())
+
+    response = client.get(f"/api/v1/menu?ids={menu_items[2]['id']},{menu_items[0]['id']}")
+    assert response.status_code == 200
+    assert response.json() == {"items": [menu_items[2], menu_items[0]], "next_page": None}
+
+
+def test_response_cache(client, menu_item):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def get(url):
+        statements.clear()
+        event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.get(url)
+        finally:
+            event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+        assert response.status_code == 200
+        return response.json(), len(statements)
+
+    client.get("/api/v1/users/me")  # authenticate, later requests hit the session cache
+    menu, queries = get("/api/v1/menu")
+    assert queries > 0
+    assert get("/api/v1/menu") == (menu, 0)
+    assert get("/api/v1/menu?size=1")[1] > 0  # the query string is part of the key
+
+    # writes invalidate the responses reading from the written tables
+    payload = {**menu_item, "price": 6.0}
+    for key in ("id", "date_created", "date_modified", "category"):
+        payload.pop(key)
+    assert client.patch(f'/api/v1/menu/{menu_item["id"]}', json=payload).status_code == 200
+    menu, queries = get("/api/v1/menu")
+    assert queries > 0
+    assert menu["items"][0]["price"] == 6.0
+    category = {"name": "Cocoa Bombz", "description": None}
+    client.patch(f'/api/v1/menu/categories/{menu_item["category_id"]}', json=category)
+    menu, queries = get("/api/v1/menu")
+    assert queries > 0
+    assert menu["items"][0]["category"]["name"] == "Cocoa Bombz"
+
+    # cached responses still honour If-None-Match
+    url = f'/api/v1/menu/{menu_item["id"]}'
+    etag = client.get(url).headers["etag"]
+    assert get(url)[1] == 0
+    statements.clear()
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url, headers={"If-None-Match": etag})
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+    assert (response.status_code, len(statements)) == (304, 0)
+
+    # other tables don't
+    client.post("/api/v1/customers", json={"name": "someone"})
+    assert get("/api/v1/menu") == (menu, 0)
+
+    # errors aren't cached
+    assert client.get("/api/v1/menu/999").status_code == 404
+    client.post("/api/v1/menu", json={**payload, "name": "Vanilla cocoa bomb"})
+    assert get("/api/v1/menu/2")[0]["name"] == "Vanilla cocoa bomb"
+    menu, queries = get("/api/v1/menu")
+    assert queries > 0
+
+    # failed writes don't (a failed flush rolls back the test's transaction, so this goes last)
+    assert client.post("/api/v1/menu/categories", json=category).status_code == 400
+    assert get("/api/v1/menu") == (menu, 0)
+
+
+def test_response_cache_with_replica(client, menu_item, monkeypatch):
+    monkeypatch.setattr(database, "has_replica", True)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def queries(url):
+        statements.clear()
+        event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            assert client.get(url).status_code == 200
+        finally:
+            event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+        return len(statements)
+
+    client.get("/api/v1/users/me")  # authenticate, later requests hit the session cache
+    payload = {**menu_item, "price": 6.0}
+    for key in ("id", "date_created", "date_modified", "category"):
+        payload.pop(key)
+    assert client.patch(f'/api/v1/menu/{menu_item["id"]}', json=payload).status_code == 200
+    # the replica may not have the write yet, don't cache what it returns
+    assert queries("/api/v1/menu") > 0
+    assert queries("/api/v1/menu") > 0
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 0)
+    assert queries("/api/v1/menu") > 0
+    assert queries("/api/v1/menu") == 0
+
+
+def test_autocomplete(client, db, menu_item):
+    def suggest(q, **params):
+        response = client.get("/api/v1/menu/autocomplete", params={"q": q, **params})
+        assert response.status_code == 200
+        return [suggestion["name"] for suggestion in response.json()]
+
+    payload = {"category_id": menu_item["category_id"], "price": 4.0, "price_units": "each"}
+    for name in ("Vanilla cocoa bomb", "Chocolate chip cookie", "Hot chocolate"):
+        assert client.post("/api/v1/menu", json={**payload, "name": name}).status_code == 201
+
+    response = client.get("/api/v1/menu/autocomplete?q=van")
+    assert response.json() == [
+        {
+            "id": 2,
+            "name": "Vanilla cocoa bomb",
+            "category_id": menu_item["category_id"],
+            "category": "Cocoa Bombs",
+            "price": 4.0,
+            "price_units": "each",
+        }
+    ]
+    # names starting with the query come first, then by name
+    assert suggest("choc") == ["Chocolate chip cookie", "Chocolate cocoa bomb", "Hot chocolate"]
+    assert suggest("choc", limit=1) == ["Chocolate chip cookie"]
+    # every word must match the prefix of a word of the name or category
+    assert suggest("choc co") == ["Chocolate chip cookie", "Chocolate cocoa bomb", "Hot chocolate"]
+    assert suggest("choc cookies") == []
+    assert suggest("van choc") == []
+    assert suggest("-") == []
+
+    # writes update the index
+    item = {**payload, "name": "Hot cocoa", "price": 3.0}
+    assert client.patch("/api/v1/menu/4", json=item).status_code == 200
+    assert suggest("hot") == ["Hot cocoa"]
+    assert suggest("choc") == ["Chocolate chip cookie", "Chocolate cocoa bomb"]
+    category = {"name": "Treats", "description": None}
+    client.patch(f'/api/v1/menu/categories/{menu_item["category_id"]}', json=category)
+    assert suggest("bombs") == []
+    assert suggest("bomb") == ["Chocolate cocoa bomb", "Vanilla cocoa bomb"]
+    assert suggest("treat") == [
+        "Chocolate chip cookie",
+        "Chocolate cocoa bomb",
+        "Hot cocoa",
+        "Vanilla cocoa bomb",
+    ]
+
+    # writes made elsewhere (e.g. by another worker) are seen too
+    db.execute(update(models.MenuItem).where(models.MenuItem.id == 4).values(name="Hot toddy"))
+    db.commit()
+    assert suggest("hot") == ["Hot toddy"]
+
+    assert client.get("/api/v1/menu/autocomplete?q=").status_code == 422
+    assert client.get("/api/v1/menu/autocomplete?q=a&limit=51").status_code == 422
+
+
+def test_autocomplete_without_index(client, menu_item, monkeypatch):
+    # workers that don't share the generations read the menu for every search
+    monkeypatch.setattr(typeahead.menu_index, "enabled", False)
+    payload = {"category_id": menu_item["category_id"], "price": 4.0, "price_units": "each"}
+    for name in ("Chocolate chip cookie", "Hot chocolate"):
+        assert client.post("/api/v1/menu", json={**payload, "name": name}).status_code == 201
+
+    response = client.get("/api/v1/menu/autocomplete", params={"q": "choc co"})
+    assert response.status_code == 200
+    assert [suggestion["name"] for suggestion in response.json()] == [
+        "Chocolate chip cookie",
+        "Chocolate cocoa bomb",
+        "Hot chocolate",
+    ]
+    assert response.json()[1]["category"] == "Cocoa Bombs"
+    assert not typeahead.menu_index._built
 
 
 def test_unauthorized(client):
@@ -129,3 +305,4 @@ def test_unauthorized(client):
     assert client.patch("/api/v1/menu/1").status_code == 403
     assert client.get("/api/v1/menu/1").status_code == 403
     assert client.get("/api/v1/menu").status_code == 403
+    assert client.get("/api/v1/menu/autocomplete?q=a").status_code == 403
@@ -1,8 +1,14 @@
+import csv
+import io
+import itertools
+import json
 from datetime import datetime, timezone
 
 import freezegun
+from fastapi_pagination.bases import CursorRawParams
+from sqlalchemy import event, text
 
-from src import models
+from src import crud, database, models, pagination, schemas
 
 
 def test_order_items(client, order):
@@ -30,6 +36,9 @@ def test_order_items(client, order):
     }
     assert order_with_new_item == {
         **order,
+        "subtotal": 580.0,
+        "total": 580.0,
+        "balance_due": 580.0,
         "order_items": [
             original_order_item,
             new_order_item,
@@ -51,6 +60,9 @@ def test_order_items(client, order):
     }
     assert order_with_new_item == {
         **order,
+        "subtotal": 630.0,
+        "total": 630.0,
+        "balance_due": 630.0,
         "order_items": [
             original_order_item,
             new_order_item,
@@ -100,6 +112,10 @@ def test_orders(client, campaign, customer, menu_item, db):
         "id": 1,
         "date_created": date_created.isoformat(),
         "date_modified": date_created.isoformat(),
+        "subtotal": 125.0,
+        "total": 145.0,
+        "amount_paid": 25.0,
+        "balance_due": 120.0,
         "customer": customer,
         "campaign": campaign,
         "order_items": [
@@ -137,6 +153,8 @@ def test_orders(client, campaign, customer, menu_item, db):
         **payload,
         "id": 1,
         "date_modified": date_modified.isoformat(),
+        "total": 150.0,
+        "balance_due": 125.0,
     }
 
     # get one
@@ -147,16 +165,23 @@ def test_orders(client, campaign, customer, menu_item, db):
     # get many
     response = client.get("/api/v1/orders?completed=True")
     assert response.status_code == 200
-    assert response.json() == {
-        "items": [updated_order],
-        "offset": 0,
-        "limit": 50,
-        "total": 1,
-    }
+    assert response.json() == {"items": [updated_order], "next_page": None}
 
     response = client.get("/api/v1/orders?completed=False")
     assert response.status_code == 200
-    assert response.json() == {"items": [], "offset": 0, "limit": 50, "total": 0}
+    assert response.json() == {"items": [], "next_page": None}
+
+    # unpaid filter
+    response = client.get("/api/v1/orders?completed=True&unpaid=True")
+    assert response.json() == {"items": [updated_order], "next_page": None}
+    response = client.get("/api/v1/orders?completed=True&unpaid=False")
+    assert response.json() == {"items": [], "next_page": None}
+    payment = {"order_id": 1, "amount": 125, "method": "zelle", "date": "2021-12-24"}
+    assert client.post("/api/v1/payments", json=payment).json()["balance_due"] == 0
+    response = client.get("/api/v1/orders?completed=True&unpaid=True")
+    assert response.json() == {"items": [], "next_page": None}
+    response = client.get("/api/v1/orders?completed=True&unpaid=False")
+    assert [order["id"] for order in response.json()["items"]] == [1]
 
     # delete
     response = client.delete("/api/v1/orders/1")
@@ -169,12 +194,353 @@ def test_orders(client, campaign, customer, menu_item, db):
     assert db.query(models.OrderItem).count() == 0
 
 
+def test_get_orders_query_count(client, customer, campaign, menu_item, db):
+    def create_order():
+        crud.create_order(
+            db,
+            schemas.OrderCreate(
+                customer_id=customer["id"],
+                campaign_id=campaign["id"],
+                order_items=[
+                    schemas.OrderItemCreateNewOrder(
+                        menu_item_id=menu_item["id"],
+                        quantity=1,
+                        menu_price=menu_item["price"],
+                        charged_price=menu_item["price"],
+                    )
+                    for _ in range(3)
+                ],
+                payments=[
+                    schemas.PaymentCreateNewOrder(amount=1, method="cash", date="2021-12-23")
+                ],
+            ),
+        )
+
+    def count_queries() -> int:
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.get("/api/v1/orders?completed=False")
+        finally:
+            event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+        assert response.status_code == 200
+        return len(statements)
+
+    client.get("/api/v1/users/me")  # authenticate, later requests hit the session cache
+    create_order()
+    one_order = count_queries()
+    for _ in range(9):
+        create_order()
+    ten_orders = count_queries()
+    assert one_order == ten_orders
+    # orders (+ customer, campaign), order items (+ menu item, category), payments
+    assert ten_orders == 3
+
+    ids, cursor = [], None
+    while True:
+        url = "/api/v1/orders?completed=False&size=3" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url).json()
+        ids += [order["id"] for order in page["items"]]
+        cursor = page["next_page"]
+        if cursor is None:
+            break
+    assert ids == list(range(1, 11))
+
+
+def test_get_orders_query_plan(db):
+    # every page is read in ORDER BY order off an index, rather than sorting all matching orders
+    cursor = pagination.encode_cursor([datetime(2021, 12, 18, tzinfo=timezone.utc), 1])
+    for completed, unpaid in itertools.product((False, True), (None, False, True)):
+        for page in (None, cursor):
+            raw_params = CursorRawParams(cursor=page, size=50)
+            query = pagination._page_query(crud.read_orders(completed, unpaid), raw_params)
+            sql = query.compile(db.bind, compile_kwargs={"literal_binds": True})
+            plan = [row[3] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            assert "USING INDEX ix_orders_completed_date_created" in plan[0]
+            assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_get_orders_by_ids(client, customer, campaign, menu_item, db):
+    orders = []
+    for completed in (False, True, False, True):
+        db_order = crud.create_order(
+            db,
+            schemas.OrderCreate(
+                customer_id=customer["id"],
+                campaign_id=campaign["id"],
+                completed=completed,
+                order_items=[
+                    schemas.OrderItemCreateNewOrder(
+                        menu_item_id=menu_item["id"],
+                        quantity=2,
+                        menu_price=menu_item["price"],
+                        charged_price=menu_item["price"],
+                    )
+                ],
+                payments=[
+                    schemas.PaymentCreateNewOrder(amount=1, method="cash", date="2021-12-23")
+                ],
+            ),
+        )
+        orders.append(json.loads(schemas.Order.from_orm(db_order).json()))
+
+    client.get("/api/v1/users/me")  # authenticate, later requests hit the session cache
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    ids = [orders[3]["id"], orders[0]["id"], 999, orders[2]["id"]]
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(f"/api/v1/orders?ids={','.join(map(str, ids))}")
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    assert response.json() == {"items": [orders[3], orders[0], orders[2]], "next_page": None}
+    # orders (+ customer, campaign), order items (+ menu item, category), payments
+    assert len(statements) == 3
+
+    response = client.get(f"/api/v1/orders?completed=false&ids={','.join(map(str, ids))}")
+    assert response.json() == {"items": [orders[0], orders[2]], "next_page": None}
+
+    response = client.get("/api/v1/orders")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "completed is required, unless ids are given"}
+
+
+def test_create_orders_bulk(client, customer, campaign, menu_item, db):
+    def order(**kwargs):
+        return {
+            "customer_id": customer["id"],
+            "campaign_id": campaign["id"],
+            "order_items": [
+                {
+                    "menu_item_id": menu_item["id"],
+                    "quantity": 2,
+                    "menu_price": menu_item["price"],
+                    "charged_price": menu_item["price"],
+                }
+            ],
+            "payments": [{"amount": 10, "method": "cash", "date": "2021-12-18"}],
+            **kwargs,
+        }
+
+    payload = [
+        order(),
+        order(customer_id=999),
+        order(notes="no payment yet", payments=[]),
+        order(campaign_id=999),
+        order(order_items=[]),
+        order(order_items=[{**order()["order_items"][0], "menu_item_id": 999}]),
+    ]
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    client.get("/api/v1/users/me")  # authenticate, later requests hit the session cache
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.post("/api/v1/orders/bulk", json=payload)
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    assert response.json() == {
+        "created": 2,
+        "failed": 4,
+        "results": [
+            {"index": 0, "id": 1, "error": None},
+            {"index": 1, "id": None, "error": "Customer 999 does not exist"},
+            {"index": 2, "id": 2, "error": None},
+            {"index": 3, "id": None, "error": "Campaign 999 does not exist"},
+            {"index": 4, "id": None, "error": "An order requires at least 1 item"},
+            {"index": 5, "id": None, "error": "MenuItem 999 does not exist"},
+        ],
+    }
+    # 1 id lookup per table, then 1 insert each for orders, order items and payments
+    assert [s.split()[3] for s in statements[:3]] == ["customers", "campaigns", "menu_items"]
+    inserts = [s.split()[2] for s in statements if s.startswith("INSERT")]
+    assert sorted(inserts) == [
+        "order_item_rollups",
+        "order_items",
+        "orders",
+        "payment_rollups",
+        "payments",
+    ]
+
+    first, second = client.get("/api/v1/orders/1").json(), client.get("/api/v1/orders/2").json()
+    assert [(p["amount"], p["method"]) for p in first["payments"]] == [(10, "cash")]
+    assert [i["quantity"] for i in first["order_items"]] == [2]
+    assert second["notes"] == "no payment yet"
+    assert second["payments"] == []
+    assert db.query(models.OrderItem).count() == 2
+    subtotal = 2 * menu_item["price"]
+    assert (first["total"], first["amount_paid"]) == (subtotal, 10)
+    assert (second["total"], second["balance_due"]) == (subtotal, subtotal)
+
+
+def test_update_orders_bulk(client, customer, campaign, menu_item, db):
+    def order(**kwargs):
+        return {
+            "customer_id": customer["id"],
+            "order_items": [
+                {
+                    "menu_item_id": menu_item["id"],
+                    "quantity": 2,
+                    "menu_price": menu_item["price"],
+                    "charged_price": menu_item["price"],
+                }
+            ],
+            **kwargs,
+        }
+
+    payload = [
+        order(date_ordered="2021-12-20"),
+        order(date_ordered="2021-12-20"),
+        order(date_ordered="2021-12-21"),
+        order(date_ordered="2021-12-21", completed=True),
+    ]
+    assert client.post("/api/v1/orders/bulk", json=payload).json()["created"] == 4
+
+    def get_orders(*ids):
+        response = client.get(f"/api/v1/orders?ids={','.join(map(str, ids))}")
+        return response.json()["items"]
+
+    # by ids, in a single UPDATE
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    client.get("/api/v1/users/me")  # authenticate, later requests hit the session cache
+    edit = {"completed": True, "date_delivered": "2021-12-22"}
+    date_modified = datetime.now(timezone.utc)
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        with freezegun.freeze_time(date_modified):
+            response = client.patch("/api/v1/orders/bulk", json={"ids": [1, 2, 999], "edit": edit})
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    assert response.json() == {"updated": 2}
+    assert [s.split()[0] for s in statements] == ["UPDATE"]
+    for updated in get_orders(1, 2):
+        assert updated["completed"] and updated["date_delivered"] == "2021-12-22"
+        assert updated["date_modified"] == date_modified.isoformat()
+    assert get_orders(3)[0]["completed"] is False
+
+    # by filter, the price adjustment updates the total
+    response = client.patch(
+        "/api/v1/orders/bulk",
+        json={
+            "filter": {"inclusive_start_date": "2021-12-21", "completed": False},
+            "edit": {"price_adjustment": -1, "notes": "late"},
+        },
+    )
+    assert response.json() == {"updated": 1}
+    updated = get_orders(3)[0]
+    assert (updated["price_adjustment"], updated["notes"]) == (-1, "late")
+    assert updated["total"] == updated["subtotal"] - 1 == updated["balance_due"]
+    assert get_orders(4)[0]["notes"] is None
+
+    # ids and a filter select the orders matching both
+    response = client.patch(
+        "/api/v1/orders/bulk",
+        json={"ids": [3, 4], "filter": {"completed": True}, "edit": {"campaign_id": None}},
+    )
+    assert response.json() == {"updated": 1}
+
+    for invalid in (
+        {"edit": {"completed": True}},
+        {"filter": {}, "edit": {"completed": True}},
+        {"ids": [1], "edit": {}},
+        {"ids": [1], "edit": {"completed": None}},
+        {"ids": [1], "edit": {"subtotal": 0}},
+    ):
+        assert client.patch("/api/v1/orders/bulk", json=invalid).status_code == 422
+    response = client.patch("/api/v1/orders/bulk", json={"ids": [1], "edit": {"customer_id": 999}})
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Customer 999 does not exist"}
+
+
+def test_order_etag(client, order, customer, menu_item, db):
+    url = f'/api/v1/orders/{order["id"]}'
+    response = client.get(url)
+    assert response.status_code == 200
+    etags = [response.headers["etag"]]
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url, headers={"If-None-Match": etags[0]})
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+    assert (response.status_code, response.content) == (304, b"")
+    assert len(statements) == 1  # the version lookup, the graph isn't loaded
+
+    def changes_etag(change, *args, **kwargs):
+        assert change(*args, **kwargs).status_code in (200, 201)
+        response = client.get(url, headers={"If-None-Match": etags[-1]})
+        assert response.status_code == 200
+        assert response.headers["etag"] not in etags
+        etags.append(response.headers["etag"])
+        return True
+
+    payment = {"order_id": order["id"], "amount": 5, "method": "cash", "date": "2021-12-20"}
+    assert changes_etag(client.post, "/api/v1/payments", json=payment)
+    assert changes_etag(client.post, "/api/v1/payments", json=payment)
+    # deleting a child leaves the max date_modified as is, the row count still changes
+    assert changes_etag(client.delete, "/api/v1/payments/1")
+    customer_edit = {"name": "cj", "notes": "regular"}
+    assert changes_etag(client.patch, f'/api/v1/customers/{customer["id"]}', json=customer_edit)
+    category_edit = {"name": "Bombs", "description": None}
+    category_url = f'/api/v1/menu/categories/{menu_item["category_id"]}'
+    assert changes_etag(client.patch, category_url, json=category_edit)
+    order_edit = {"customer_id": customer["id"], "notes": "ring the bell"}
+    assert changes_etag(client.patch, url, json=order_edit)
+
+    assert client.get("/api/v1/orders/999", headers={"If-None-Match": "*"}).status_code == 404
+
+
+def test_export_orders(client, order, customer):
+    payment = {"order_id": order["id"], "amount": 30, "method": "cash", "date": "2021-12-20"}
+    client.post("/api/v1/payments", json=payment)
+
+    response = client.get("/api/v1/orders/export")
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="orders.csv"'
+    [row] = csv.DictReader(io.StringIO(response.text))
+    assert row["id"] == str(order["id"])
+    assert row["date"] == order["date_created"][:10]
+    assert row["customer_name"] == customer["name"]
+    assert (row["total"], row["amount_paid"], row["balance_due"]) == ("80.0", "30.0", "50.0")
+
+    response = client.get("/api/v1/orders/export?format=ndjson")
+    [row] = [json.loads(line) for line in response.text.splitlines()]
+    assert (row["id"], row["completed"], row["balance_due"]) == (order["id"], False, 50)
+
+    response = client.get(f"/api/v1/orders/export?exclusive_end_date={row['date']}")
+    assert response.text.splitlines() == [response.text.splitlines()[0]]
+
+
 def test_unauthorized(client):
     client.get("/api/auth/logout")
     assert client.post("/api/v1/orders").status_code == 403
     assert client.patch("/api/v1/orders/1").status_code == 403
     assert client.get("/api/v1/orders/1").status_code == 403
     assert client.get("/api/v1/orders").status_code == 403
+    assert client.post("/api/v1/orders/bulk").status_code == 403
+    assert client.get("/api/v1/orders/export").status_code == 403
     assert client.delete("/api/v1/orders/1").status_code == 403
     assert client.post("/api/v1/orders/items").status_code == 403
     assert client.patch("/api/v1/orders/items/1").status_code == 403
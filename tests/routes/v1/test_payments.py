@@ -1,7 +1,12 @@
+import csv
+import io
+import json
 from datetime import datetime, timezone
 
 import freezegun
 
+from src import export
+
 
 def test_payments(client, order):
     # create
@@ -22,7 +27,12 @@ def test_payments(client, order):
         "date_created": date_created.isoformat(),
         "date_modified": date_created.isoformat(),
     }
-    assert order_with_payment == {**order, "payments": [payment]}
+    assert order_with_payment == {
+        **order,
+        "amount_paid": 10.0,
+        "balance_due": order["total"] - 10,
+        "payments": [payment],
+    }
 
     # edit
     payload = {**payload, "date": "2021-12-19"}
@@ -37,17 +47,21 @@ def test_payments(client, order):
         "id": 1,
         "date_modified": date_modified.isoformat(),
     }
-    assert order_with_payment == {**order, "payments": [payment]}
+    assert order_with_payment == {
+        **order,
+        "amount_paid": 10.0,
+        "balance_due": order["total"] - 10,
+        "payments": [payment],
+    }
 
     # get many
-    response = client.get("/api/v1/payments?offset=0&limit=10")
+    response = client.get("/api/v1/payments?size=10")
     assert response.status_code == 200
-    assert response.json() == {
-        "items": [payment],
-        "limit": 10,
-        "offset": 0,
-        "total": 1,
-    }
+    assert response.json() == {"items": [payment], "next_page": None}
+
+    response = client.get("/api/v1/payments?inclusive_start_date=2021-12-20")
+    assert response.status_code == 200
+    assert response.json() == {"items": [], "next_page": None}
 
     # delete
     response = client.delete("/api/v1/payments/1")
@@ -56,9 +70,42 @@ def test_payments(client, order):
     assert order_without_payment == order
 
 
+def test_export_payments(client, order, monkeypatch):
+    monkeypatch.setattr(export, "BATCH_SIZE", 2)  # stream several batches
+    for day in ("2021-12-20", "2021-12-21", "2021-12-22"):
+        payment = {"order_id": order["id"], "amount": 10, "method": "cash", "date": day}
+        assert client.post("/api/v1/payments", json=payment).status_code == 201
+
+    response = client.get("/api/v1/payments/export?inclusive_start_date=2021-12-21")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="payments.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(r["id"], r["order_id"], r["date"], r["method"], r["amount"]) for r in rows] == [
+        ("2", str(order["id"]), "2021-12-21", "cash", "10.0"),
+        ("3", str(order["id"]), "2021-12-22", "cash", "10.0"),
+    ]
+
+    response = client.get("/api/v1/payments/export?format=ndjson&exclusive_end_date=2021-12-22")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(r["id"], r["date"], r["amount"]) for r in rows] == [
+        (1, "2021-12-20", 10),
+        (2, "2021-12-21", 10),
+    ]
+    assert datetime.fromisoformat(rows[0]["date_created"]).tzinfo is not None
+
+    response = client.get("/api/v1/payments/export?inclusive_start_date=2022-01-01")
+    assert response.text.splitlines() == [
+        "id,order_id,date,method,amount,date_created,date_modified"
+    ]
+
+
 def test_unauthorized(client):
     client.get("/api/auth/logout")
     assert client.post("/api/v1/payments").status_code == 403
+    assert client.get("/api/v1/payments/export").status_code == 403
     assert client.patch("/api/v1/payments/1").status_code == 403
     assert client.get("/api/v1/payments").status_code == 403
     assert client.delete("/api/v1/payments/1").status_code == 403
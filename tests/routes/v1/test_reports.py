@@ -0,0 +1,201 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import insert, update
+
+from src import crud, models
+
+
+def snapshot_rollups(db):
+    payments = db.query(models.PaymentRollup).all()
+    order_items = db.query(models.OrderItemRollup).all()
+    return (
+        sorted((r.date, r.method, round(r.amount, 6), r.payments) for r in payments),
+        sorted(
+            (r.date, r.menu_item_id, r.campaign_id or 0, r.quantity, round(r.revenue, 6))
+            for r in order_items
+        ),
+    )
+
+
+@pytest.fixture
+def assert_rollups_consistent(db):
+    """Assert the incrementally maintained rollups match a rebuild from the raw tables"""
+
+    def check():
+        incremental = snapshot_rollups(db)
+        crud.rebuild_rollups(db)
+        assert snapshot_rollups(db) == incremental
+
+    return check
+
+
+def test_reports(client, order, campaign, assert_rollups_consistent):
+    menu_item_id = order["order_items"][0]["menu_item_id"]
+    order_date = order["date_created"][:10]
+    assert_rollups_consistent()
+
+    # payments
+    for amount, method in ((10, "zelle"), (5, "cash"), (2.5, "cash")):
+        payment = {
+            "order_id": order["id"],
+            "amount": amount,
+            "method": method,
+            "date": "2021-12-22",
+        }
+        assert client.post("/api/v1/payments", json=payment).status_code == 201
+    payment = {"order_id": order["id"], "amount": 1, "method": "cash", "date": "2021-12-23"}
+    assert client.post("/api/v1/payments", json=payment).status_code == 201
+    assert_rollups_consistent()
+
+    response = client.get("/api/v1/reports/revenue/daily")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"date": "2021-12-22", "amount": 17.5, "payments": 3},
+        {"date": "2021-12-23", "amount": 1, "payments": 1},
+    ]
+    response = client.get("/api/v1/reports/revenue/daily?inclusive_start_date=2021-12-23")
+    assert response.json() == [{"date": "2021-12-23", "amount": 1, "payments": 1}]
+
+    response = client.get("/api/v1/reports/revenue/payment-methods")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"method": "cash", "amount": 8.5, "payments": 3},
+        {"method": "zelle", "amount": 10, "payments": 1},
+    ]
+
+    # editing and deleting payments
+    payment = {"order_id": order["id"], "amount": 3, "method": "paypal", "date": "2021-12-23"}
+    assert client.patch("/api/v1/payments/4", json=payment).status_code == 200
+    assert client.delete("/api/v1/payments/2").status_code == 200
+    assert_rollups_consistent()
+    response = client.get("/api/v1/reports/revenue/payment-methods")
+    assert response.json() == [
+        {"method": "cash", "amount": 2.5, "payments": 1},
+        {"method": "paypal", "amount": 3, "payments": 1},
+        {"method": "zelle", "amount": 10, "payments": 1},
+    ]
+
+    # order items
+    response = client.get("/api/v1/reports/revenue/menu-items")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"menu_item_id": menu_item_id, "quantity": 4, "revenue": 80, "order_items": 1}
+    ]
+    order_item = {
+        "order_id": order["id"],
+        "menu_item_id": menu_item_id,
+        "menu_price": 5,
+        "quantity": 2,
+        "charged_price": 4,
+    }
+    assert client.post("/api/v1/orders/items", json=order_item).status_code == 201
+    response = client.patch("/api/v1/orders/items/2", json={**order_item, "quantity": 3})
+    assert response.status_code == 200
+    assert_rollups_consistent()
+    response = client.get(f"/api/v1/reports/revenue/menu-items?inclusive_start_date={order_date}")
+    assert response.json() == [
+        {"menu_item_id": menu_item_id, "quantity": 7, "revenue": 92, "order_items": 2}
+    ]
+
+    # moving the order to another day and campaign moves its items
+    edit = {"customer_id": order["customer"]["id"], "campaign_id": campaign["id"]}
+    edit["date_ordered"] = "2021-12-18"
+    assert client.patch(f'/api/v1/orders/{order["id"]}', json=edit).status_code == 200
+    assert_rollups_consistent()
+    response = client.get("/api/v1/reports/revenue/campaigns")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"campaign_id": campaign["id"], "quantity": 7, "revenue": 92, "order_items": 2}
+    ]
+    response = client.get("/api/v1/reports/revenue/menu-items?exclusive_end_date=2021-12-19")
+    assert response.json() == [
+        {"menu_item_id": menu_item_id, "quantity": 7, "revenue": 92, "order_items": 2}
+    ]
+
+    assert client.delete("/api/v1/orders/items/2").status_code == 200
+    assert_rollups_consistent()
+
+    # deleting the order empties the reports
+    assert client.delete(f'/api/v1/orders/{order["id"]}').status_code == 200
+    assert_rollups_consistent()
+    for report in ("daily", "payment-methods", "campaigns", "menu-items"):
+        assert client.get(f"/api/v1/reports/revenue/{report}").json() == []
+
+
+def test_bulk_created_orders_are_rolled_up(client, customer, menu_item, assert_rollups_consistent):
+    order = {
+        "customer_id": customer["id"],
+        "date_ordered": "2021-12-18",
+        "order_items": [
+            {"menu_item_id": menu_item["id"], "quantity": 2, "menu_price": 5, "charged_price": 5}
+        ],
+        "payments": [{"amount": 10, "method": "cash", "date": "2021-12-18"}],
+    }
+    assert client.post("/api/v1/orders/bulk", json=[order, order]).json()["created"] == 2
+    assert_rollups_consistent()
+    assert client.get("/api/v1/reports/revenue/daily").json() == [
+        {"date": "2021-12-18", "amount": 20, "payments": 2}
+    ]
+    assert client.get("/api/v1/reports/revenue/menu-items").json() == [
+        {"menu_item_id": menu_item["id"], "quantity": 4, "revenue": 20, "order_items": 2}
+    ]
+
+
+def test_bulk_edited_orders_move_their_rollups(
+    client, customer, campaign, menu_item, assert_rollups_consistent
+):
+    order = {
+        "customer_id": customer["id"],
+        "date_ordered": "2021-12-18",
+        "completed": False,
+        "order_items": [
+            {"menu_item_id": menu_item["id"], "quantity": 2, "menu_price": 5, "charged_price": 5}
+        ],
+    }
+    assert client.post("/api/v1/orders/bulk", json=[order, order]).json()["created"] == 2
+
+    # the filter matches the orders before the edit, not after
+    edit = {"date_ordered": "2021-12-20", "campaign_id": campaign["id"], "completed": True}
+    response = client.patch(
+        "/api/v1/orders/bulk", json={"filter": {"completed": False}, "edit": edit}
+    )
+    assert response.json() == {"updated": 2}
+    assert_rollups_consistent()
+    assert client.get("/api/v1/reports/revenue/campaigns").json() == [
+        {"campaign_id": campaign["id"], "quantity": 4, "revenue": 20, "order_items": 2}
+    ]
+    response = client.get("/api/v1/reports/revenue/menu-items?inclusive_start_date=2021-12-19")
+    assert response.json() == [
+        {"menu_item_id": menu_item["id"], "quantity": 4, "revenue": 20, "order_items": 2}
+    ]
+
+
+def test_rollups_add_up_concurrent_writes(client, db, order):
+    payment = {"order_id": order["id"], "amount": 10, "method": "cash", "date": "2021-12-22"}
+    assert client.post("/api/v1/payments", json=payment).status_code == 201
+    rollup = db.query(models.PaymentRollup).one()
+    # another transaction adds a payment, behind the back of the session's loaded rollup
+    rollups = models.PaymentRollup.__table__
+    db.connection().execute(
+        update(rollups).values(amount=rollups.c.amount + 5, payments=rollups.c.payments + 1)
+    )
+    assert client.post("/api/v1/payments", json={**payment, "amount": 7}).status_code == 201
+    db.refresh(rollup)
+    assert (rollup.amount, rollup.payments) == (22, 3)
+
+
+def test_bulk_statements_invalidate_cached_reports(client, db):
+    assert client.get("/api/v1/reports/revenue/daily").json() == []
+    rollup = {"date": date(2021, 12, 18), "method": "cash", "amount": 5.0, "payments": 1}
+    db.execute(insert(models.PaymentRollup), [rollup])
+    db.commit()
+    assert client.get("/api/v1/reports/revenue/daily").json() == [
+        {"date": "2021-12-18", "amount": 5, "payments": 1}
+    ]
+
+
+def test_unauthorized(client):
+    client.get("/api/auth/logout")
+    for report in ("daily", "payment-methods", "campaigns", "menu-items"):
+        assert client.get(f"/api/v1/reports/revenue/{report}").status_code == 403
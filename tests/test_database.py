@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+
+from src import database, dependencies, settings
+from src.dependencies import get_db, get_read_db
+from src.main import app
+
+
+def pragmas(connection):
+    names = ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size")
+    return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+
+EXPECTED_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": 1,  # NORMAL
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -65536,
+}
+
+
+def test_sqlite_file_engine(tmp_path):
+    engine = database._create_engine(f"sqlite:///{tmp_path / 'bakery.db'}")
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == settings.DB_POOL_SIZE
+    with engine.connect() as connection:
+        assert pragmas(connection) == EXPECTED_PRAGMAS
+    engine.dispose()
+
+
+def test_sqlite_concurrent_writes(tmp_path):
+    engine = database._create_engine(f"sqlite:///{tmp_path / 'bakery.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        connection.execute(text("INSERT INTO t VALUES (0)"))
+
+    writer = engine.connect()
+    writer.execute(text("UPDATE t SET x = 1"))  # holds the write lock until committed
+
+    # readers aren't blocked by the writer, and see the last committed state
+    with engine.connect() as reader:
+        assert reader.execute(text("SELECT x FROM t")).scalar() == 0
+
+    # a second writer waits for the lock instead of failing with "database is locked"
+    threading.Timer(0.2, writer.commit).start()
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE t SET x = x + 1"))
+    assert time.perf_counter() - start >= 0.1
+    writer.close()
+    with engine.connect() as reader:
+        assert reader.execute(text("SELECT x FROM t")).scalar() == 2
+    engine.dispose()
+
+
+def test_read_engine_is_read_only(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'bakery.db'}"
+    monkeypatch.setattr(settings, "SQLALCHEMY_DATABASE_URL", url)
+    primary, replica = database._create_engine(url), database._create_read_engine(url)
+    with primary.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        connection.execute(text("INSERT INTO t VALUES (1)"))
+    with replica.connect() as connection:
+        assert connection.execute(text("SELECT x FROM t")).scalar() == 1
+        with pytest.raises(OperationalError, match="readonly"):
+            connection.execute(text("UPDATE t SET x = 2"))
+    primary.dispose()
+    replica.dispose()
+
+
+def test_read_your_writes(client, db, menu_item, monkeypatch):
+    monkeypatch.setattr(database, "has_replica", True)
+    del app.dependency_overrides[get_read_db]
+    sessions = []
+    real_read_session = database.ReadSessionLocal
+
+    def session_factory(name):
+        def factory():
+            sessions.append(name)
+            return db if name == "primary" else real_read_session(bind=db.connection())
+
+        return factory
+
+    monkeypatch.setattr(database, "SessionLocal", session_factory("primary"))
+    monkeypatch.setattr(database, "ReadSessionLocal", session_factory("replica"))
+
+    assert client.get("/api/v1/menu").status_code == 200
+    assert sessions == ["replica"]
+
+    # writes send clients to the primary for a while
+    payload = {**menu_item, "price": 6.0}
+    for key in ("id", "date_created", "date_modified", "category"):
+        payload.pop(key)
+    app.dependency_overrides.pop(get_db)  # sets the cookie
+    response = client.patch(f'/api/v1/menu/{menu_item["id"]}', json=payload)
+    assert response.status_code == 200
+    assert f"Max-Age={settings.READ_YOUR_WRITES_SECONDS}" in response.headers["set-cookie"]
+    app.dependency_overrides[get_db] = lambda: db
+    sessions.clear()
+    assert client.get("/api/v1/menu").json()["items"][0]["price"] == 6.0
+    assert sessions == ["primary"]
+
+    client.cookies.delete(dependencies.READ_PRIMARY_COOKIE)
+    sessions.clear()
+    assert client.get(f'/api/v1/menu/{menu_item["id"]}').status_code == 200
+    assert sessions == ["replica"]
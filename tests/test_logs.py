@@ -0,0 +1,77 @@
+import io
+import json
+import logging
+import time
+
+import pytest
+
+from src import crud, logs
+
+
+@pytest.fixture
+def log_stream(client):
+    stream = io.StringIO()
+    logs.shutdown()
+    logs.setup(stream=stream)
+    client.get("/api/v1/users/me")  # authenticate, later requests hit the session cache
+    yield stream
+    logs.shutdown()
+
+
+def read_entries(stream) -> list[dict]:
+    logs.shutdown()  # writes the queued records
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_access_log(client, customer, log_stream):
+    response = client.get(f'/api/v1/customers/{customer["id"]}', headers={"X-Request-ID": "abc-1"})
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "abc-1"
+    response = client.get("/api/v1/customers/999")
+    generated_id = response.headers["x-request-id"]
+    assert len(generated_id) == 32
+
+    entries = [e for e in read_entries(log_stream) if e["logger"] == "bakery.access"]
+    found, not_found = entries[-2:]
+    assert found["message"] == f'GET /api/v1/customers/{customer["id"]} 200'
+    assert found["level"] == "INFO"
+    assert found["request_id"] == "abc-1"
+    assert found["route"] == "GET /api/v1/customers/{customer_id}"
+    assert found["status"] == 200
+    assert found["latency_ms"] > 0
+    assert found["db_statements"] == 2  # the customer's version, then the customer
+    assert 0 < found["db_ms"] < found["latency_ms"]
+    assert (not_found["request_id"], not_found["status"]) == (generated_id, 404)
+
+
+def test_exception_log(client, log_stream, monkeypatch):
+    def read_customer_version(db, customer_id):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(crud, "read_customer_version", read_customer_version)
+    response = client.get("/api/v1/customers/1", headers={"X-Request-ID": "not a valid id!"})
+    assert response.status_code == 500
+
+    entries = read_entries(log_stream)
+    error = next(e for e in entries if e["level"] == "ERROR")
+    assert error["message"] == "Unhandled exception"
+    assert error["request_id"] == response.headers["x-request-id"] != "not a valid id!"
+    assert error["exception"].startswith("Traceback")
+    assert "RuntimeError: boom" in error["exception"]
+
+
+def test_logging_does_not_wait_for_the_stream(client):
+    class SlowStream(io.StringIO):
+        def write(self, s):
+            time.sleep(0.2)
+            return super().write(s)
+
+    stream = SlowStream()
+    logs.shutdown()
+    logs.setup(stream=stream)
+    start = time.perf_counter()
+    for i in range(5):
+        logging.getLogger("bakery").info("message %d", i)
+    assert time.perf_counter() - start < 0.2
+    entries = read_entries(stream)
+    assert [e["message"] for e in entries] == [f"message {i}" for i in range(5)]
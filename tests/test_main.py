@@ -0,0 +1,12 @@
+from src import crud
+
+
+def test_unhandled_exception(client, monkeypatch):
+    def read_customer_version(db, customer_id):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(crud, "read_customer_version", read_customer_version)
+    response = client.get("/api/v1/customers/1", headers={"Origin": "http://localhost:3000"})
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Internal server error"
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
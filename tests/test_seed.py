@@ -0,0 +1,53 @@
+import random
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from src import crud, models, schemas, seed
+
+
+def test_seed(db):
+    end = date(2023, 3, 1)
+    counts = seed.seed(db, scale=0.05, days=90, rng=random.Random(0), end=end)
+    assert counts["customers"] == 50
+    assert counts["orders"] == 500
+    assert counts["order_items"] >= 500
+    for table, count in counts.items():
+        model = next(m for m in models.Base.__subclasses__() if m.__tablename__ == table)
+        assert db.scalar(select(func.count(model.id))) == count
+
+    orders = db.scalars(select(models.Order).order_by(models.Order.id)).all()
+    assert all(date(2022, 12, 1) <= order.date_ordered < end for order in orders)
+    assert [o.date_created for o in orders] == sorted(o.date_created for o in orders)
+    assert {o.campaign_id for o in orders} == {None, 1, 2}  # Holidays 2022, Valentine's 2023
+    # recent orders are still open
+    assert not all(order.completed for order in orders if (end - order.date_ordered).days < 7)
+    order = crud.read_order(db, 100)
+    assert schemas.Order.from_orm(order).customer.name == order.customer.name.lower()
+
+    # the totals and rollups written by the seed are those crud would compute
+    totals = [(o.id, o.subtotal, o.total, o.amount_paid) for o in orders]
+    crud.update_order_totals(db)
+    db.expire_all()
+    assert [(o.id, o.subtotal, o.total, o.amount_paid) for o in orders] == totals
+    payments = db.execute(
+        select(
+            models.Payment.date,
+            models.Payment.method,
+            func.round(func.sum(models.Payment.amount), 2),
+        )
+        .group_by(models.Payment.date, models.Payment.method)
+        .order_by(models.Payment.date, models.Payment.method)
+    ).all()
+    rollups = db.execute(
+        select(
+            models.PaymentRollup.date,
+            models.PaymentRollup.method,
+            func.round(models.PaymentRollup.amount, 2),
+        ).order_by(models.PaymentRollup.date, models.PaymentRollup.method)
+    ).all()
+    assert rollups == payments
+
+    with pytest.raises(ValueError, match="The customers table is not empty"):
+        seed.seed(db, scale=0.01)
@@ -0,0 +1,48 @@
+import logging
+
+import pytest
+
+from src import settings, slow_queries
+
+
+@pytest.fixture
+def slow_query_log(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+    slow_queries.rate_limiter.reset()
+    caplog.set_level(logging.WARNING, logger="bakery.slow_queries")
+    yield caplog
+    slow_queries.rate_limiter.reset()
+
+
+def test_slow_query_log(client, customer, slow_query_log):
+    client.get("/api/v1/users/me")  # authenticate, later requests hit the session cache
+    slow_query_log.clear()
+    assert client.get(f'/api/v1/customers/{customer["id"]}').status_code == 200
+    messages = [record.getMessage() for record in slow_query_log.records]
+    assert messages
+    message = messages[-1]
+    assert message.startswith("Slow query (")
+    assert " in GET /api/v1/customers/{customer_id}\n" in message
+    assert "FROM customers" in message
+    assert f"parameters: ({customer['id']}," in message
+    assert "query plan:\nSEARCH customers USING INTEGER PRIMARY KEY (rowid=?)" in message
+
+
+def test_slow_query_log_threshold(client, customer, slow_query_log, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 60_000)
+    assert client.get(f'/api/v1/customers/{customer["id"]}').status_code == 200
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", -1)
+    assert client.get(f'/api/v1/customers/{customer["id"]}').status_code == 200
+    assert slow_query_log.records == []
+
+
+def test_slow_query_log_rate_limit(client, customer, slow_query_log, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG_LIMIT", 2)
+    for _ in range(5):
+        assert client.get(f'/api/v1/customers/{customer["id"]}').status_code == 200
+    assert len(slow_query_log.records) == 2
+
+    # the next window reports how many weren't logged
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG_INTERVAL_SECONDS", 0)
+    assert client.get(f'/api/v1/customers/{customer["id"]}').status_code == 200
+    assert "more slow queries not logged" in slow_query_log.records[2].getMessage()